@@ -0,0 +1,292 @@
+import os
+import asyncio
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from module.index_manager import get_index_manager
+from module.jobs import JobQueueFull, get_job_registry
+from module.retriever import RETRIEVAL_MODES, DEFAULT_RETRIEVAL_MODE, get_retriever
+from module.generator import stream_answer
+from module.scheduler import get_scheduler
+from module import tracing
+
+# Headless HTTP API for programmatic clients:
+#   uvicorn api:app --host 0.0.0.0 --port 8000
+
+# -------------------- CONCURRENCY LIMITS --------------------
+GENERATION_CONCURRENCY = int(os.environ.get("DOCUMIND_API_GENERATION_CONCURRENCY", "2"))
+EMBEDDING_CONCURRENCY = int(os.environ.get("DOCUMIND_API_EMBEDDING_CONCURRENCY", "8"))
+INGESTION_CONCURRENCY = int(os.environ.get("DOCUMIND_API_INGESTION_CONCURRENCY", "1"))
+MAX_QUEUED_REQUESTS = int(os.environ.get("DOCUMIND_API_MAX_QUEUE", "32"))
+RETRY_AFTER_SECONDS = 5
+
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` requests run at once; up to `max_queue` more wait for a slot.
+    Anything beyond that is rejected with 429 instead of piling up behind the model.
+    """
+    def __init__(self, name, limit, max_queue=MAX_QUEUED_REQUESTS):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.running = 0
+        self._semaphore = None
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many concurrent {self.name} requests, try again later.",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self._semaphore.release()
+
+    def releaser(self):
+        """`release` for one acquired slot that is safe to call more than once."""
+        released = False
+
+        def release_once():
+            nonlocal released
+            if not released:
+                released = True
+                self.release()
+        return release_once
+
+    def stats(self):
+        return {"limit": self.limit, "running": self.running, "waiting": self.waiting, "max_queue": self.max_queue}
+
+
+limiters = {
+    "generation": ConcurrencyLimiter("generation", GENERATION_CONCURRENCY),
+    "embedding": ConcurrencyLimiter("embedding", EMBEDDING_CONCURRENCY),
+    "ingestion": ConcurrencyLimiter("ingestion", INGESTION_CONCURRENCY),
+}
+
+
+# -------------------- HELPERS --------------------
+class _ReleasingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that calls `release()` however the response ends. The body
+    generator's own `finally` never runs if the client disconnects before the
+    first chunk is requested.
+    """
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+class _Upload:
+    """Adapts an uploaded file to the interface process_documents expects from Streamlit uploads."""
+    def __init__(self, name, data):
+        self.name = name
+        self.size = len(data)
+        self._data = data
+
+    def getbuffer(self):
+        return memoryview(self._data)
+
+
+def _upload_name(filename):
+    """The client's file name, rejected (400) unless it is a plain name without a path."""
+    if not filename or filename in (".", "..") or any(c in filename for c in ("/", "\\", "\0")):
+        raise HTTPException(status_code=400, detail=f"Invalid file name {filename!r}.")
+    return filename
+
+
+def _collection_or_404(name):
+    """Blocking (disk I/O, index loading): call it through run_in_threadpool."""
+    try:
+        collection = get_index_manager().get(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if collection is None:
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' has no indexed documents.")
+    return collection
+
+
+def _retriever(collection, mode):
+    if mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {RETRIEVAL_MODES}")
+    return get_retriever(
+        collection.vectorstore,
+        mode=mode,
+        index_version=collection.version,
+        lexical_index=collection.lexical_index,
+        collection=collection.name,
+    )
+
+
+def _retrieve(retriever, collection, query):
+    with tracing.trace("retrieve", collection=collection, mode=retriever.mode):
+        return retriever.get_relevant_documents(query)
+
+
+async def _submit_job(name, uploads):
+    """Queue an ingestion job; 400 for a bad collection name, 429 once too many jobs are pending."""
+    try:
+        return await run_in_threadpool(get_job_registry().submit, name, uploads)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=429, detail=f"{e} Try again later.", headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+
+def _wait_for(job):
+    job.wait()
+    return job.snapshot()
+
+
+# -------------------- API --------------------
+app = FastAPI(title="DocuMind API")
+
+
+class Turn(BaseModel):
+    user: str
+    bot: str
+
+
+class QueryRequest(BaseModel):
+    query: str
+    mode: str = DEFAULT_RETRIEVAL_MODE
+    stream: bool = False
+    session: str | None = None  # client id for fair queueing; also keys the chat summary
+    history: list[Turn] = []    # earlier turns of the chat, oldest first, for follow-up questions
+
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "limits": {name: limiter.stats() for name, limiter in limiters.items()},
+        "scheduler": get_scheduler().stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage timings, request totals and counters in the Prometheus text format."""
+    return tracing.export_prometheus()
+
+
+@app.get("/traces")
+async def traces(limit: int = 20, kind: str | None = None):
+    """The most recent traces with their per-stage breakdown."""
+    return tracing.export_json(limit, kind)
+
+
+@app.get("/collections")
+async def list_collections():
+    return {"collections": get_index_manager().list_collections()}
+
+
+@app.post("/collections/{name}/documents")
+async def ingest(name: str, files: list[UploadFile] = File(...), background: bool = False):
+    """
+    Index the uploaded files. With `background=true` the ingestion job is returned
+    right away (202) and can be followed under /jobs/<id>.
+    """
+    uploads = [_Upload(_upload_name(f.filename), await f.read()) for f in files]
+    if background:
+        job = await _submit_job(name, uploads)
+        return JSONResponse(job.snapshot(), status_code=202)
+
+    # The slot is taken before the job is queued, so a 429 never leaves a job behind
+    limiter = limiters["ingestion"]
+    await limiter.acquire()
+    try:
+        job = await _submit_job(name, uploads)
+        return await run_in_threadpool(_wait_for, job)
+    finally:
+        limiter.release()
+
+
+@app.get("/collections/{name}/jobs")
+async def list_jobs(name: str):
+    return {"jobs": [job.snapshot() for job in get_job_registry().list(name)]}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = get_job_registry().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job '{job_id}'.")
+    return job.snapshot()
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Stop the job after its current page range; files already indexed are kept."""
+    if not get_job_registry().cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is not running.")
+    return get_job_registry().get(job_id).snapshot()
+
+
+@app.post("/collections/{name}/retrieve")
+async def retrieve(name: str, request: QueryRequest):
+    collection = await run_in_threadpool(_collection_or_404, name)
+    retriever = _retriever(collection, request.mode)
+
+    # llm_extract runs the LLM on every hit, so it counts against generation capacity
+    limiter = limiters["generation" if request.mode == "llm_extract" else "embedding"]
+    await limiter.acquire()
+    try:
+        docs = await run_in_threadpool(_retrieve, retriever, name, request.query)
+    finally:
+        limiter.release()
+
+    return {
+        "documents": [{"content": doc.page_content, "metadata": doc.metadata} for doc in docs],
+        "timings_ms": retriever.last_timings,
+    }
+
+
+@app.post("/collections/{name}/answer")
+async def answer(name: str, request: QueryRequest):
+    collection = await run_in_threadpool(_collection_or_404, name)
+    retriever = _retriever(collection, request.mode)
+
+    session_state = {"session_id": request.session, "chat_history": [turn.model_dump() for turn in request.history]}
+
+    limiter = limiters["generation"]
+    await limiter.acquire()
+
+    if request.stream:
+        release = limiter.releaser()
+
+        async def tokens():
+            # The slot is held until the last token has been sent
+            try:
+                async for token in iterate_in_threadpool(stream_answer(request.query, retriever, session_state)):
+                    yield token
+            finally:
+                release()
+
+        return _ReleasingStreamingResponse(tokens(), release, media_type="text/plain; charset=utf-8")
+
+    try:
+        text = await run_in_threadpool(lambda: "".join(stream_answer(request.query, retriever, session_state)))
+    finally:
+        limiter.release()
+    return {"answer": text, "query": session_state.get("last_query", request.query)}
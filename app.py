@@ -1,17 +1,41 @@
 import streamlit as st
-import base64, os, time
-from module.document_processor import process_documents
-from module.retriever import get_retriever
-from module.generator import get_answer
+import base64, importlib, logging, os, time, uuid
+from module import tracing
+
+# The RAG pipeline (LangChain, FAISS, pypdf, Ollama clients) is only imported
+# once the home page needs it; see load_pipeline().
+PIPELINE_MODULES = ["module.index_manager", "module.jobs", "module.retriever", "module.generator"]
+TRACE_PANEL_ROWS = 10
+JOB_POLL_SECONDS = 1.0
+TRACE_PANEL_DEFAULT = os.environ.get("DOCUMIND_DEBUG", "") == "1"
+
+logger = logging.getLogger(__name__)
 
 # -------------------- LOGO ENCODING --------------------
+@st.cache_data(show_spinner=False)
 def get_base64_image(image_path):
-    """Encode an image to base64 for embedding"""
+    """Encode an image to base64 for embedding (read from disk once per process)"""
     if not os.path.exists(image_path):
         return ""
     with open(image_path, "rb") as img_file:
         return base64.b64encode(img_file.read()).decode()
 
+
+@st.cache_resource(show_spinner="Loading DocuMind...")
+def load_pipeline():
+    """
+    Import the pipeline modules once per server process. The time each import
+    takes is logged and recorded as a "startup" trace; returns it in ms.
+    """
+    startup = tracing.Trace("startup")
+    for name in PIPELINE_MODULES:
+        with startup.span(f"import {name}"):
+            importlib.import_module(name)
+    startup.finish()
+    timings = startup.stage_totals()
+    logger.info("pipeline imported in %.0f ms %s", startup.duration_ms, {k: round(v) for k, v in timings.items()})
+    return timings
+
 LOGO_PATH = "assets/no_text.png"
 LOGO_BASE64 = get_base64_image(LOGO_PATH)
 ICON_PATH = "assets/logo.png"
@@ -25,7 +49,8 @@ st.set_page_config(
 )
 
 # -------------------- GLOBAL STYLE --------------------
-st.markdown("""
+# One <style> element for the whole app; a constant, so nothing is rebuilt per rerun.
+STYLE = """
 <style>
 header[data-testid="stHeader"] {display: none;}
 
@@ -149,8 +174,39 @@ section[data-testid="stFileUploader"] div[data-testid="stFileUploaderDropzone"]
 [data-testid="stMarkdownContainer"] h4 {
     text-align: left !important;
 }
+
+/* navbar */
+.nav-container {
+    display: flex;
+    justify-content: center;
+    align-items: center;
+    gap: 10px;
+    position: absolute;
+    top: 1px;
+    left: 0;
+    right: 0;
+    z-index: 9999;
+    border-bottom: 1px solid black !important;
+}
+div[data-testid="stVerticalBlock"] button {
+    background: none !important;
+    border: none !important;
+    font-weight: 600 !important;
+    font-size: 17px !important;
+    color: #1A1A1A !important;
+    cursor: pointer !important;
+    padding: 0px 3px !important;
+}
+div[data-testid="stVerticalBlock"] button:hover {
+    color: #F382C6 !important;
+}
+div[data-testid="stVerticalBlock"].active button {
+    color: #F382C6 !important;
+    border-bottom: 1px solid #F382C6 !important;
+}
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(STYLE, unsafe_allow_html=True)
 
 # -------------------- NAVBAR --------------------
 def render_navbar():
@@ -160,39 +216,6 @@ def render_navbar():
     if "page" not in st.session_state:
         st.session_state.page = "home"
 
-    st.markdown("""
-    <style>
-    .nav-container {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        gap: 10px;
-        position: absolute;
-        top: 1px;
-        left: 0;
-        right: 0;
-        z-index: 9999;
-        border-bottom: 1px solid black !important;
-    }
-    div[data-testid="stVerticalBlock"] button {
-        background: none !important;
-        border: none !important;
-        font-weight: 600 !important;
-        font-size: 17px !important;
-        color: #1A1A1A !important;
-        cursor: pointer !important;
-        padding: 0px 3px !important;
-    }
-    div[data-testid="stVerticalBlock"] button:hover {
-        color: #F382C6 !important;
-    }
-    div[data-testid="stVerticalBlock"].active button {
-        color: #F382C6 !important;
-        border-bottom: 1px solid #F382C6 !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
     st.markdown('<div class="nav-container">', unsafe_allow_html=True)
     cols = st.columns(len(pages))
     for i, page in enumerate(pages):
@@ -210,6 +233,13 @@ page = st.session_state.page
 
 # -------------------- SIDEBAR (ONLY ON HOME) --------------------
 if page == "home":
+    load_pipeline()
+    from module.index_manager import DEFAULT_COLLECTION, get_index_manager
+    from module.jobs import JobQueueFull, get_job_registry
+    from module.retriever import get_retriever
+    from module.generator import stream_answer
+    from module.memory import ConversationMemory
+
     if ICON_BASE64:
         st.sidebar.markdown(
             f"""
@@ -219,15 +249,47 @@ if page == "home":
             """,
             unsafe_allow_html=True
         )
+    # ---- COLLECTION PICKER ----
+    manager = get_index_manager()
+    if "collection" not in st.session_state:
+        st.session_state.collection = DEFAULT_COLLECTION
+    if "next_collection" in st.session_state:
+        st.session_state.collection = st.session_state.pop("next_collection")
+
+    st.sidebar.markdown("<h2 style='color:#F7F1E8;text-align:center;'>Collection</h2>", unsafe_allow_html=True)
+    st.sidebar.selectbox("Collection", manager.list_collections(), key="collection", label_visibility="collapsed")
+    new_collection = st.sidebar.text_input("New collection", placeholder="New collection name", label_visibility="collapsed")
+    if st.sidebar.button("Create Collection") and new_collection:
+        try:
+            st.session_state.next_collection = manager.create_collection(new_collection.strip())
+            st.rerun()
+        except ValueError as e:
+            st.sidebar.warning(f"⚠ {e}")
+
+    # Switching collections starts a fresh conversation against that collection
+    if st.session_state.get("active_collection") != st.session_state.collection:
+        st.session_state.active_collection = st.session_state.collection
+        st.session_state.vectorstore = None
+        st.session_state.retriever = None
+        st.session_state.processed_uploads = None
+        st.session_state.chat_history = []
+        st.session_state.memory = ConversationMemory()
+
     st.sidebar.markdown("<h2 style='color:#F7F1E8;text-align:center;'>Upload Documents Here</h2>", unsafe_allow_html=True)
-    uploaded_files = st.sidebar.file_uploader("", type=["pdf", "txt"], accept_multiple_files=True)
+    # One uploader per collection, so files picked for one are never submitted to another
+    uploaded_files = st.sidebar.file_uploader(
+        "", type=["pdf", "txt"], accept_multiple_files=True, key=f"uploads_{st.session_state.collection}"
+    )
 
     if st.sidebar.button("Reset Chat"):
         st.session_state.chat_history = []
+        st.session_state.memory = ConversationMemory()
         msg = st.empty()
         msg.markdown("<p style='text-align:center;'>Chat has been reset</p>", unsafe_allow_html=True)
         time.sleep(2)
         msg.empty()
+
+    st.sidebar.checkbox("Show trace panel", value=TRACE_PANEL_DEFAULT, key="show_traces")
 else:
     uploaded_files = None
 
@@ -238,6 +300,54 @@ if "retriever" not in st.session_state:
     st.session_state.retriever = None
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "processed_uploads" not in st.session_state:
+    st.session_state.processed_uploads = None
+
+# -------------------- INGESTION STATUS --------------------
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def ingest_status(job_id):
+    """Poll the background ingestion job; rerun the whole page once it has finished."""
+    from module.jobs import get_job_registry
+    job = get_job_registry().get(job_id)
+    if job is None:
+        st.session_state.ingest_job = None
+        return
+    info = job.snapshot()
+    if not job.active:
+        st.session_state.ingest_job = None
+        st.session_state.ingest_result = info
+        st.rerun()
+
+    total = max(info["files_total"], 1)
+    st.progress(
+        info["files_finished"] / total,
+        text=f"Indexing {info['files_finished']}/{info['files_total']} files · {info['chunks']} chunks "
+             f"· you can keep chatting with the documents already indexed",
+    )
+    with st.expander("Files"):
+        st.dataframe(
+            [{"file": name, "status": f["status"], "pages": f["pages"], "chunks": f["chunks"],
+              "duplicates": f["duplicates"]}
+             for name, f in info["files"].items()],
+            use_container_width=True,
+        )
+    if st.button("Cancel indexing", key=f"cancel_{job_id}"):
+        job.cancel()
+
+
+def show_ingest_result(info):
+    for warning in info["warnings"]:
+        st.warning(warning)
+    if info["status"] == "done":
+        st.markdown("<p style='text-align:center;'>Documents processed successfully</p>", unsafe_allow_html=True)
+        if info["duplicates"]:
+            st.caption(f"{info['duplicates']} duplicate chunks were already indexed and not embedded again")
+    elif info["status"] == "cancelled":
+        st.info("Indexing cancelled. Files finished before that are searchable.")
+    elif info["status"] == "failed":
+        st.error(f"⚠ Indexing failed: {info['error']}")
 
 # -------------------- PAGE LOGIC --------------------
 if page == "home":
@@ -247,26 +357,36 @@ if page == "home":
         unsafe_allow_html=True
     )
 
-    if uploaded_files and st.session_state.vectorstore is None:
-        with st.spinner("Processing your document..."):
-            vectorstore = process_documents(uploaded_files)
-            retriever = get_retriever(vectorstore)
-            st.session_state.vectorstore = vectorstore
-            st.session_state.retriever = retriever
-        placeholder = st.empty()
-        placeholder.markdown("<p style='text-align:center;'>Documents processed successfully</p>", unsafe_allow_html=True)
-        time.sleep(2)
-        placeholder.empty()
-
-    user_query = st.chat_input("Type your question here...")
-    if user_query:
-        retriever = st.session_state.retriever
-        if not retriever:
-            bot_reply = "Please upload and process a document first."
-        else:
-            with st.spinner("Thinking..."):
-                bot_reply = get_answer(user_query, retriever, st.session_state)
-        st.session_state.chat_history.append({"user": user_query, "bot": bot_reply})
+    # Re-run ingestion whenever the set of uploads changes; unchanged files are skipped by hash.
+    # It runs as a background job, so the chat keeps answering from what is already indexed.
+    upload_key = tuple((f.name, f.size) for f in uploaded_files) if uploaded_files else None
+    if uploaded_files and upload_key != st.session_state.processed_uploads:
+        try:
+            job = get_job_registry().submit(st.session_state.collection, uploaded_files)
+            st.session_state.ingest_job = job.id
+            st.session_state.processed_uploads = upload_key
+        except JobQueueFull:
+            # Not marked as processed → submitted again on the next rerun
+            st.warning("⚠ Too many indexing jobs are waiting; your files will be indexed once one finishes.")
+
+    if st.session_state.get("ingest_job"):
+        ingest_status(st.session_state.ingest_job)
+    if "ingest_result" in st.session_state:
+        show_ingest_result(st.session_state.pop("ingest_result"))
+
+    # All sessions query the same process-wide collection; pick up the latest published version
+    collection = get_index_manager().get(st.session_state.collection)
+    if collection is None:
+        st.session_state.vectorstore = None
+        st.session_state.retriever = None
+    elif collection.vectorstore is not st.session_state.vectorstore:
+        st.session_state.vectorstore = collection.vectorstore
+        st.session_state.retriever = get_retriever(
+            collection.vectorstore,
+            index_version=collection.version,
+            lexical_index=collection.lexical_index,
+            collection=collection.name,
+        )
 
     for chat in st.session_state.chat_history:
         with st.chat_message("user"):
@@ -274,6 +394,42 @@ if page == "home":
         with st.chat_message("assistant"):
             st.write(chat["bot"])
 
+    user_query = st.chat_input("Type your question here...")
+    if user_query:
+        with st.chat_message("user"):
+            st.write(user_query)
+        with st.chat_message("assistant"):
+            retriever = st.session_state.retriever
+            if not retriever:
+                bot_reply = "Please upload and process a document first."
+                st.write(bot_reply)
+            else:
+                # Tokens are rendered as they arrive; write_stream returns the full text
+                st.session_state.pop("last_prompt_stats", None)
+                bot_reply = st.write_stream(stream_answer(user_query, retriever, st.session_state))
+                stats = st.session_state.get("last_prompt_stats")
+                if stats:
+                    st.caption(
+                        f"Prompt: {stats['prompt_tokens']} tokens · "
+                        f"{stats['chunks_used']} of {stats['chunks_retrieved']} chunks"
+                    )
+                if st.session_state.get("last_query", user_query) != user_query:
+                    st.caption(f"Searched for: {st.session_state.last_query}")
+        st.session_state.chat_history.append({"user": user_query, "bot": bot_reply})
+
+    # ---- TRACE PANEL (debug) ----
+    if st.session_state.get("show_traces"):
+        with st.expander(f"Trace panel · last {TRACE_PANEL_ROWS} requests on this server", expanded=True):
+            rows = []
+            for t in tracing.recent_traces(TRACE_PANEL_ROWS):
+                row = {"request": t.kind, "status": t.status, "total ms": round(t.duration_ms or 0, 1)}
+                row.update({stage: round(ms, 1) for stage, ms in t.stage_totals().items()})
+                rows.append(row)
+            if rows:
+                st.dataframe(rows, use_container_width=True)
+            else:
+                st.caption("No requests traced yet.")
+
 # -------------------- ABOUT --------------------
 elif page == "about":
     st.title("About DocuMind")
@@ -0,0 +1,78 @@
+import sys
+import json
+import argparse
+import subprocess
+from benchmarks.run import ROOT
+
+# Compare chunking strategies on the same corpus:
+#   python -m benchmarks.chunking --size medium --strategies recursive,structured
+#   python -m benchmarks.chunking --size small --structured-corpus
+# Every strategy is a separate benchmarks.run process; the table shows each
+# strategy next to the first one.
+
+METRICS = [  # (result key, label)
+    ("chunks", "chunks"),
+    ("index_size_mb", "index MB"),
+    ("ingest_seconds", "ingest s"),
+    ("duplicate_chunks", "duplicates"),
+    ("reingest_seconds", "re-ingest s"),
+    ("chunks_per_sec", "chunks/s"),
+    ("hit_rate", "hit rate"),
+    ("retrieval_ms_p50", "retr p50 ms"),
+    ("retrieval_ms_p95", "retr p95 ms"),
+]
+
+
+def run_strategy(strategy, args):
+    command = [
+        sys.executable, "-m", "benchmarks.run", "--single", args.size, "--chunking", strategy,
+        "--queries", str(args.queries), "--answers", "0", "--seed", str(args.seed), "--mode", args.mode,
+    ]
+    if args.structured_corpus:
+        command.append("--structured-corpus")
+    if args.revisions:
+        command.extend(["--revisions", str(args.revisions)])
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+    if completed.returncode != 0:
+        print(completed.stderr, file=sys.stderr)
+        raise SystemExit(f"Benchmark for strategy '{strategy}' failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare DocuMind chunking strategies")
+    parser.add_argument("--size", default="small", help="corpus size (benchmarks.corpus.SIZES)")
+    parser.add_argument("--strategies", default="recursive,structured", help="comma-separated, first is the reference")
+    parser.add_argument("--structured-corpus", action="store_true", help="pages with section headings and tables")
+    parser.add_argument("--revisions", type=float, default=0.0, help="fraction of documents re-uploaded lightly edited")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--mode", default="similarity", help="retrieval mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for strategy in args.strategies.split(","):
+        print(f"[{strategy}] running...", file=sys.stderr)
+        results[strategy] = run_strategy(strategy, args)
+
+    reference = results[next(iter(results))]
+    print(f"{'metric':<13}" + "".join(f"{strategy:>22}" for strategy in results))
+    for key, label in METRICS:
+        cells = []
+        for metrics in results.values():
+            value, base = metrics.get(key), reference.get(key)
+            if value is None:
+                cells.append(f"{'-':>22}")
+                continue
+            change = f" ({(value - base) / base * 100:+.0f}%)" if base and metrics is not reference else ""
+            cells.append(f"{f'{value:g}{change}':>22}")
+        print(f"{label:<13}" + "".join(cells))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"size": args.size, "structured_corpus": args.structured_corpus, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
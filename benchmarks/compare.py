@@ -0,0 +1,57 @@
+import sys
+import json
+import argparse
+
+# Compare two benchmarks.run result files:
+#   python -m benchmarks.compare baseline.json candidate.json --threshold 10
+# Exits with status 1 when any metric got worse by more than the threshold (%).
+
+HIGHER_IS_BETTER = {"docs_per_sec", "chunks_per_sec", "hit_rate"}
+LOWER_IS_BETTER = {
+    "ingest_seconds", "retrieval_ms_p50", "retrieval_ms_p95", "answer_ms_p50", "answer_ms_p95",
+    "first_token_ms_p50", "first_token_ms_p95", "index_size_mb", "peak_rss_mb",
+}
+
+
+def compare(baseline, candidate, threshold=10.0):
+    """Rows of (size, metric, old, new, change %, regressed) for the metrics both runs share."""
+    rows = []
+    for size, new_metrics in candidate["results"].items():
+        old_metrics = baseline["results"].get(size)
+        if old_metrics is None:
+            continue
+        for metric in sorted(HIGHER_IS_BETTER | LOWER_IS_BETTER):
+            old, new = old_metrics.get(metric), new_metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append((size, metric, old, new, change, worse > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two DocuMind benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(f"{'size':<8} {'metric':<20} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for size, metric, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{size:<8} {metric:<20} {old:>12g} {new:>12g} {change:>+8.1f}%{flag}")
+
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regression(s) beyond {args.threshold:g}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
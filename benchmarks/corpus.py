@@ -0,0 +1,166 @@
+import os
+import re
+import random
+
+# Synthetic PDF/TXT corpora for the benchmarks.
+# Documents are built from a seeded pseudo-word vocabulary, so a given size and seed
+# always produce the same bytes; every document also yields sample queries whose
+# expected source file is known.
+
+# -------------------- SIZES --------------------
+# name → (documents, pages per document); half of the documents are PDFs
+SIZES = {
+    "small": (20, 3),
+    "medium": (100, 5),
+    "large": (400, 8),
+}
+WORDS_PER_PAGE = 250
+TABLE_PROBABILITY = 0.3  # per section of a structured page
+VOCABULARY_SIZE = 5000
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "te", "vo", "zi", "pa", "do", "qu", "fe", "ga", "hi", "ju"]
+
+
+def _vocabulary(rng):
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _sentences(rng, vocabulary, n_words):
+    sentences = []
+    while n_words > 0:
+        length = min(rng.randint(8, 16), n_words)
+        words = rng.choices(vocabulary, k=length)
+        sentences.append(" ".join(words).capitalize() + ".")
+        n_words -= length
+    return sentences
+
+
+def make_pdf(pages, line_chars=90):
+    """
+    Minimal PDF with one Helvetica text page per string in `pages` (no parentheses or
+    backslashes); every line of a page string starts a new line in the PDF.
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>")
+    font_id = 3 + 2 * len(pages)
+    for i, text in enumerate(pages):
+        lines = []
+        for paragraph in text.split("\n"):
+            line = ""
+            for word in paragraph.split():
+                if line and len(line) + len(word) >= line_chars:
+                    lines.append(line)
+                    line = ""
+                line = f"{line} {word}" if line else word
+            lines.append(line)
+        body = " ".join(f"({ln}) Tj T*" for ln in lines)
+        stream = f"BT /F1 10 Tf 12 TL 50 750 Td {body} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def _structured_page(rng, vocabulary, number):
+    """
+    A page of numbered sections, each a heading and one or two paragraphs, with a
+    small table now and then. Returns (page text, its paragraphs).
+    """
+    lines, paragraphs = [], []
+    words_left = WORDS_PER_PAGE
+    section = 1
+    while words_left > 0:
+        title = " ".join(word.capitalize() for word in rng.choices(vocabulary, k=rng.randint(2, 4)))
+        lines.append(f"{number}.{section} {title}")
+        for _ in range(rng.randint(1, 2)):
+            if words_left <= 0:
+                break
+            paragraph = " ".join(_sentences(rng, vocabulary, min(words_left, rng.randint(40, 90))))
+            lines.append(paragraph)
+            paragraphs.append(paragraph)
+            words_left -= len(paragraph.split())
+        if rng.random() < TABLE_PROBABILITY:
+            for _ in range(rng.randint(3, 6)):
+                lines.append("    ".join([rng.choice(vocabulary)] + [str(rng.randint(1, 999)) for _ in range(3)]))
+        section += 1
+    return "\n".join(lines), paragraphs
+
+
+def _write_document(folder, name, pages):
+    data = "\n\n".join(pages).encode("utf-8") if name.endswith(".txt") else make_pdf(pages)
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def _revise(rng, vocabulary, pages):
+    """
+    Copy of `pages` with one word replaced on one of them, like a lightly edited
+    manual. Returns (pages, the new word and the one after it).
+    """
+    pages = list(pages)
+    p = rng.randrange(len(pages))
+    # A word followed by another in the same sentence, so the pair lands in one chunk
+    word = rng.choice(list(re.finditer(r"\b[a-z]+\b(?= ([a-z]+))", pages[p])))
+    new_word = rng.choice(vocabulary)
+    pages[p] = pages[p][:word.start()] + new_word + pages[p][word.end():]
+    return pages, f"{new_word} {word.group(1)}"
+
+
+def build_corpus(size, folder, seed=0, queries_per_document=2, structured=False, revisions=0.0):
+    """
+    Write the `size` corpus into `folder`; with `structured`, pages have section
+    headings and tables instead of running text. A `revisions` fraction of the
+    documents is also written lightly edited, under the same name, into
+    `folder`/revised. Returns (file paths, [(query, expected source file name), ...],
+    [(revised file path, text only in the revision), ...]).
+    """
+    n_documents, n_pages = SIZES[size]
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(rng)
+    os.makedirs(folder, exist_ok=True)
+
+    paths, queries, documents = [], [], []
+    for d in range(n_documents):
+        if structured:
+            pages, paragraphs = zip(*(_structured_page(rng, vocabulary, p + 1) for p in range(n_pages)))
+            sources = [paragraph for page in paragraphs for paragraph in page]
+        else:
+            pages = [" ".join(_sentences(rng, vocabulary, WORDS_PER_PAGE)) for _ in range(n_pages)]
+            sources = pages
+        name = f"doc_{d:04d}.txt" if d % 2 else f"doc_{d:04d}.pdf"
+        paths.append(_write_document(folder, name, pages))
+        documents.append((name, pages))
+
+        # A query is a sentence lifted from the document, minus its first words
+        for _ in range(queries_per_document):
+            sentence = rng.choice(rng.choice(sources).split(". "))
+            queries.append((" ".join(sentence.rstrip(".").split()[2:]), name))
+
+    rng.shuffle(queries)
+
+    # Own generator, so the base corpus and queries don't depend on `revisions`
+    revision_rng = random.Random(seed + 1)
+    revised = []
+    os.makedirs(os.path.join(folder, "revised"), exist_ok=True)
+    for name, pages in revision_rng.sample(documents, int(len(documents) * revisions)):
+        pages, edit = _revise(revision_rng, vocabulary, pages)
+        revised.append((_write_document(os.path.join(folder, "revised"), name, pages), edit))
+    return paths, queries, revised
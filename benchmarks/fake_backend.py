@@ -0,0 +1,102 @@
+import re
+import time
+import hashlib
+from typing import ClassVar
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+# Deterministic, offline stand-ins for OllamaEmbeddings / OllamaLLM.
+# Install them with module.resources.use_backend(FakeLLM, FakeEmbeddings); every
+# CustomEmbeddings, retriever and stream_answer call then runs without Ollama.
+# Latencies are simulated with sleeps, which release the GIL like real HTTP calls.
+
+# -------------------- SETTINGS --------------------
+EMBEDDING_DIM = 768           # nomic-embed-text
+EMBED_LATENCY_MS = 20.0       # per request
+EMBED_LATENCY_PER_TEXT_MS = 2.0
+PREFILL_MS_PER_TOKEN = 0.5    # prompt processing
+MS_PER_OUTPUT_TOKEN = 15.0    # generation
+ANSWER_TOKENS = 40
+
+_WORDS = re.compile(r"\w+")
+
+
+def _word_vector(word):
+    seed = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Bag-of-words hashing embeddings: every word maps to a fixed random vector and a
+    text embeds to the normalized sum, so texts sharing words are close and
+    retrieval quality is meaningful.
+    """
+    latency_ms = EMBED_LATENCY_MS
+    latency_per_text_ms = EMBED_LATENCY_PER_TEXT_MS
+
+    def __init__(self, model="fake", **kwargs):
+        self.model = model
+        self._cache = {}
+
+    def _embed(self, text):
+        vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        for word in _WORDS.findall(text.lower()):
+            if word not in self._cache:
+                self._cache[word] = _word_vector(word)
+            vector += self._cache[word]
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        time.sleep((self.latency_ms + self.latency_per_text_ms * len(texts)) / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeLLM(LLM):
+    """
+    Echoes the first words after the prompt's "Context:" line (or the prompt) as its
+    answer, with simulated prefill and per-token latency.
+    """
+    model: str = "fake"
+    temperature: float = 0.0
+    prefill_ms_per_token: ClassVar[float] = PREFILL_MS_PER_TOKEN
+    ms_per_output_token: ClassVar[float] = MS_PER_OUTPUT_TOKEN
+    answer_tokens: ClassVar[int] = ANSWER_TOKENS
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _answer(self, prompt):
+        time.sleep(self.prefill_ms_per_token * len(prompt.split()) / 1000)
+        source = prompt.split("Context:", 1)[-1]
+        return _WORDS.findall(source)[:self.answer_tokens] or ["NO_OUTPUT"]
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        words = self._answer(prompt)
+        time.sleep(self.ms_per_output_token * len(words) / 1000)
+        return " ".join(words)
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        for i, word in enumerate(self._answer(prompt)):
+            time.sleep(self.ms_per_output_token / 1000)
+            yield GenerationChunk(text=word if i == 0 else " " + word)
+
+
+def configure(embed_latency_ms=None, embed_latency_per_text_ms=None, prefill_ms_per_token=None,
+              ms_per_output_token=None):
+    """Set the simulated latencies of all fake clients."""
+    if embed_latency_ms is not None:
+        FakeEmbeddings.latency_ms = embed_latency_ms
+    if embed_latency_per_text_ms is not None:
+        FakeEmbeddings.latency_per_text_ms = embed_latency_per_text_ms
+    if prefill_ms_per_token is not None:
+        FakeLLM.prefill_ms_per_token = prefill_ms_per_token
+    if ms_per_output_token is not None:
+        FakeLLM.ms_per_output_token = ms_per_output_token
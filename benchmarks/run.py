@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+# Offline benchmark of the ingestion and query paths against the fake backend.
+#   python -m benchmarks.run --sizes small,medium --out results.json
+#   python -m benchmarks.compare baseline.json results.json
+# Every corpus size runs in its own interpreter, so peak RSS is per size.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLLECTION = "bench"
+COLLECTION_DIR = os.path.join("vectorstore_data", "collections", COLLECTION)
+
+
+class _Upload:
+    """A corpus file in the shape process_documents expects from Streamlit uploads."""
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._data = f.read()
+        self.size = len(self._data)
+
+    def getbuffer(self):
+        return memoryview(self._data)
+
+
+def _percentiles(values):
+    if not values:
+        return None, None
+    return round(float(np.percentile(values, 50)), 2), round(float(np.percentile(values, 95)), 2)
+
+
+def _folder_size(folder):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names
+    )
+
+
+def run_single(size, args):
+    """Benchmark one corpus size in a scratch directory; returns the metrics dict."""
+    from benchmarks.corpus import build_corpus
+    from benchmarks.fake_backend import FakeEmbeddings, FakeLLM, configure
+    from module.resources import use_backend
+
+    configure(args.embed_latency_ms, args.embed_latency_per_text_ms, args.prefill_ms_per_token,
+              args.ms_per_output_token)
+    use_backend(FakeLLM, FakeEmbeddings)
+
+    workspace = tempfile.mkdtemp(prefix=f"documind-bench-{size}-")
+    try:
+        # Relative data paths (vectorstore_data/, temp_files/) land in the workspace
+        paths, queries, revised = build_corpus(
+            size, os.path.join(workspace, "corpus"), seed=args.seed, structured=args.structured_corpus,
+            revisions=args.revisions,
+        )
+        os.chdir(workspace)
+        return _measure(paths, queries[:args.queries], revised, args)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def _measure(paths, queries, revised, args):
+    from module.chunking import get_chunker
+    from module.context_builder import normalize_whitespace
+    from module.document_processor import process_documents
+    from module.retriever import get_retriever
+    from module.generator import stream_answer
+
+    uploads = [_Upload(path) for path in paths]
+    warnings = []
+    duplicates = []
+
+    def on_progress(event, file_name, info):
+        if event == "pages":
+            duplicates.append(info["duplicates"])
+
+    start = time.perf_counter()
+    chunker = get_chunker(args.chunking, model_name="nomic-embed-text")
+    vectorstore, lexical_index, manifest = process_documents(
+        uploads, folder=COLLECTION_DIR, on_warning=warnings.append, on_progress=on_progress, chunker=chunker
+    )
+    ingest_seconds = time.perf_counter() - start
+
+    # Re-upload the edited documents: unchanged chunks are de-duplicated, the edits
+    # themselves must be indexed
+    reingest_seconds = None
+    if revised:
+        start = time.perf_counter()
+        vectorstore, lexical_index, manifest = process_documents(
+            [_Upload(path) for path, _ in revised], folder=COLLECTION_DIR, on_warning=warnings.append,
+            on_progress=on_progress, chunker=chunker,
+        )
+        reingest_seconds = round(time.perf_counter() - start, 3)
+        for path, edit in revised:
+            chunks = manifest["files"][os.path.basename(path)]["chunk_ids"]
+            if not any(edit in normalize_whitespace(vectorstore.docstore.search(chunk).page_content) for chunk in chunks):
+                raise SystemExit(f"Edit '{edit}' of {os.path.basename(path)} is not in the index")
+
+    retriever = get_retriever(
+        vectorstore, mode=args.mode, index_version=manifest["version"], lexical_index=lexical_index,
+        collection=COLLECTION,
+    )
+
+    retrieval_ms, hits = [], 0
+    for query, source in queries:
+        start = time.perf_counter()
+        docs = retriever.get_relevant_documents(query)
+        retrieval_ms.append((time.perf_counter() - start) * 1000)
+        hits += any(
+            os.path.basename(doc.metadata.get("source", "")) == source or source in doc.metadata.get("sources", ())
+            for doc in docs
+        )
+
+    answer_ms, first_token_ms = [], []
+    for query, _ in queries[:args.answers]:
+        start = time.perf_counter()
+        for i, _token in enumerate(stream_answer(query, retriever, {})):
+            if i == 0:
+                first_token_ms.append((time.perf_counter() - start) * 1000)
+        answer_ms.append((time.perf_counter() - start) * 1000)
+
+    retrieval_p50, retrieval_p95 = _percentiles(retrieval_ms)
+    answer_p50, answer_p95 = _percentiles(answer_ms)
+    first_token_p50, first_token_p95 = _percentiles(first_token_ms)
+    n_chunks = vectorstore.index.ntotal if vectorstore is not None else 0
+    return {
+        "files": len(paths),
+        "chunks": n_chunks,
+        "duplicate_chunks": sum(duplicates),
+        "failed_files": len(warnings),
+        "ingest_seconds": round(ingest_seconds, 3),
+        "reingest_seconds": reingest_seconds,
+        "docs_per_sec": round(len(paths) / ingest_seconds, 2),
+        "chunks_per_sec": round(n_chunks / ingest_seconds, 2),
+        "queries": len(queries),
+        "hit_rate": round(hits / len(queries), 3) if queries else None,
+        "retrieval_ms_p50": retrieval_p50,
+        "retrieval_ms_p95": retrieval_p95,
+        "answer_ms_p50": answer_p50,
+        "answer_ms_p95": answer_p95,
+        "first_token_ms_p50": first_token_p50,
+        "first_token_ms_p95": first_token_p95,
+        "index_size_mb": round(_folder_size(COLLECTION_DIR) / 2**20, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # KiB on Linux
+        "index_type": manifest.get("index", {}).get("type"),
+        "chunking": chunker.signature,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline DocuMind ingestion/query benchmark")
+    parser.add_argument("--sizes", default="small,medium", help="comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=50, help="retrieval queries per size")
+    parser.add_argument("--answers", type=int, default=20, help="of those, how many also generate an answer")
+    parser.add_argument("--mode", default="similarity", help="retrieval mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunking", default="structured", help="chunking strategy (module.chunking)")
+    parser.add_argument("--structured-corpus", action="store_true", help="pages with section headings and tables")
+    parser.add_argument("--revisions", type=float, default=0.0, help="fraction of documents re-uploaded lightly edited")
+    parser.add_argument("--embed-latency-ms", type=float, default=None)
+    parser.add_argument("--embed-latency-per-text-ms", type=float, default=None)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=None)
+    parser.add_argument("--ms-per-output-token", type=float, default=None)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--single", help=argparse.SUPPRESS)  # internal: run one size, print JSON
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.single:
+        logging.getLogger("streamlit").setLevel(logging.ERROR)  # no ScriptRunContext outside `streamlit run`
+        print(json.dumps(run_single(args.single, args)))
+        return
+
+    from benchmarks.corpus import SIZES
+
+    forwarded = list(argv if argv is not None else sys.argv[1:])
+    results = {}
+    for size in args.sizes.split(","):
+        if size not in SIZES:
+            raise SystemExit(f"Unknown size '{size}', expected one of {sorted(SIZES)}")
+        print(f"[{size}] running...", file=sys.stderr)
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", *forwarded, "--single", size],
+            capture_output=True, text=True, cwd=ROOT,
+        )
+        if completed.returncode != 0:
+            print(completed.stderr, file=sys.stderr)
+            raise SystemExit(f"Benchmark for size '{size}' failed")
+        results[size] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"[{size}] {json.dumps(results[size])}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "single", "sizes")},
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
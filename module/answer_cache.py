@@ -0,0 +1,101 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# -------------------- SETTINGS --------------------
+SIMILARITY_THRESHOLD = 0.95  # cosine similarity for a query to count as a repeat
+TTL_SECONDS = 60 * 60
+MAX_ENTRIES = 256
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    Past queries are kept as L2-normalized embeddings in a small NumPy matrix;
+    a new query reuses the answer of the most similar past query when their
+    cosine similarity reaches `threshold`. Entries expire after `ttl` seconds,
+    the least recently used are evicted past `max_entries`, and everything is
+    dropped as soon as a lookup or store names a different index version.
+    """
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_version = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # query -> (vector, answer, created)
+        self._matrix = None
+        self._keys = []
+        self._lock = threading.Lock()
+
+    def lookup(self, index_version, query_vector):
+        """Return the cached answer for a near-duplicate query, or None."""
+        with self._lock:
+            self._check_version(index_version)
+            self._expire()
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._keys = list(self._entries)
+                self._matrix = np.stack([self._entries[k][0] for k in self._keys])
+
+            similarities = self._matrix @ _normalize(query_vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][1]
+
+    def store(self, index_version, query, query_vector, answer):
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[query] = (_normalize(query_vector), answer, time.time())
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def _check_version(self, index_version):
+        if index_version != self.index_version:
+            self._entries.clear()
+            self._matrix = None
+            self.index_version = index_version
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [k for k, (_, _, created) in self._entries.items() if created < cutoff]
+        for k in expired:
+            del self._entries[k]
+        if expired:
+            self._matrix = None
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(collection=None):
+    """Process-wide answer cache of `collection`, shared by all sessions querying it."""
+    with _caches_lock:
+        if collection not in _caches:
+            _caches[collection] = AnswerCache()
+        return _caches[collection]
@@ -0,0 +1,255 @@
+import os
+import re
+import hashlib
+from langchain_core.documents import Document
+from module.context_builder import CHARS_PER_TOKEN, count_tokens, normalize_whitespace
+
+# -------------------- STRATEGIES --------------------
+# structured → chunks follow the page's blocks (headings, paragraphs, tables), sized in
+#              tokens for the embedding model, no overlap; a block is only split
+#              when it alone exceeds the budget (paragraphs at sentences, tables at rows)
+# recursive  → the previous fixed splitter: 2000 characters with 300 overlap
+# Chunks never span pages, so `page` is exact for citations.
+STRATEGIES = ("structured", "recursive")
+DEFAULT_STRATEGY = os.environ.get("DOCUMIND_CHUNKING", "structured")
+
+CHUNK_TOKENS = int(os.environ.get("DOCUMIND_CHUNK_TOKENS", "512"))
+MIN_CHUNK_FRACTION = 0.5    # a heading only closes the current chunk once it is this full
+RECURSIVE_CHUNK_CHARS = 2000
+RECURSIVE_OVERLAP_CHARS = 300
+LEGACY_SIGNATURE = f"recursive:{RECURSIVE_CHUNK_CHARS}/{RECURSIVE_OVERLAP_CHARS}"  # manifests without "chunker"
+
+# Context window of the embedding models in use, in tokens. Chunk sizes stay well
+# below it because count_tokens() is an estimate, not the model's tokenizer.
+EMBEDDING_CONTEXT_TOKENS = {
+    "nomic-embed-text": 2048,   # Ollama's default num_ctx for this model
+    "mxbai-embed-large": 512,
+    "all-minilm": 256,
+}
+CONTEXT_SAFETY = 0.75
+
+_HEADING_NUMBER = re.compile(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.|[A-Z]\.)\s+\S")
+_HEADING_WORD = re.compile(r"^(chapter|section|part|appendix)\b", re.IGNORECASE)
+_TABLE_COLUMNS = re.compile(r"\S(\t| {2,})\S.*\S(\t| {2,})\S")
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+_SPACE = re.compile(r"\s+")
+
+
+def chunk_tokens_for(model_name, requested=CHUNK_TOKENS):
+    """Chunk size in tokens for `model_name`: `requested`, capped by the model's context."""
+    context = EMBEDDING_CONTEXT_TOKENS.get(model_name.split(":")[0]) if model_name else None
+    if context is None:
+        return requested
+    return max(1, min(requested, int(context * CONTEXT_SAFETY)))
+
+
+def content_hash(text):
+    """Hash of a chunk's whitespace-normalized text, to spot identical chunks."""
+    return hashlib.sha1(normalize_whitespace(text).encode("utf-8")).hexdigest()[:16]
+
+
+def _annotate(doc, start, end, chunker, **extra):
+    metadata = dict(doc.metadata, start=start, end=end, hash=content_hash(doc.page_content[start:end]),
+                    chunker=chunker, **extra)
+    return Document(page_content=doc.page_content[start:end], metadata=metadata)
+
+
+# -------------------- STRUCTURE --------------------
+def _is_heading(line, previous):
+    """Short title-like line after a blank line, a table or the end of a sentence."""
+    text = line.strip()
+    if not text or len(text) > 80 or len(text.split()) > 12 or text[-1] in ".,;":
+        return False
+    if previous.strip() and previous.rstrip()[-1] not in ".!?:" and not _is_table_row(previous):
+        return False
+    if text.startswith("#") or _HEADING_NUMBER.match(text) or _HEADING_WORD.match(text):
+        return True
+    words = [w for w in text.split() if w[0].isalpha()]
+    if not words:
+        return False
+    if text.isupper():
+        return True
+    return len(words) > 1 and sum(w[0].isupper() for w in words) / len(words) >= 0.75
+
+
+def _is_table_row(line):
+    return line.count("|") >= 2 or bool(_TABLE_COLUMNS.search(line))
+
+
+def _blocks(text):
+    """
+    Split page text into (kind, start, end) blocks: "heading", "table" (consecutive
+    row-like lines) or "text" (lines up to a blank line, heading or table).
+    """
+    blocks = []
+    kind, start, end = None, 0, 0
+    previous = ""
+    for match in re.finditer(r"[^\n]*\n?", text):
+        line = match.group()
+        if not line:
+            break
+        if not line.strip():
+            line_kind = None
+        elif _is_heading(line, previous):
+            line_kind = "heading"
+        elif _is_table_row(line):
+            line_kind = "table"
+        else:
+            line_kind = "text"
+
+        if line_kind != kind or line_kind == "heading":
+            if kind is not None:
+                blocks.append((kind, start, end))
+            kind, start = line_kind, match.start()
+        end = match.start() + len(line.rstrip())
+        previous = line
+    if kind is not None:
+        blocks.append((kind, start, end))
+    return blocks
+
+
+def _pieces(text, start, end, kind, budget):
+    """Split the block [start, end) into spans of at most `budget` tokens."""
+    if kind == "table":
+        cuts = [m.end() + start for m in re.finditer(r"\n", text[start:end])]
+    else:
+        cuts = [m.end() + start for m in _SENTENCE_END.finditer(text[start:end])]
+    bounds = [start] + cuts + [end]
+    spans = []
+    for a, b in zip(bounds, bounds[1:]):
+        if b <= a:
+            continue
+        if count_tokens(text[a:b]) <= budget:
+            spans.append((a, b))
+            continue
+        # A single sentence or row longer than the budget: cut between words
+        limit = budget * CHARS_PER_TOKEN
+        while b - a > limit:
+            cut = max((m.start() for m in _SPACE.finditer(text, a, a + limit)), default=a + limit)
+            cut = cut if cut > a else a + limit
+            spans.append((a, cut))
+            a = cut
+        spans.append((a, b))
+    return spans
+
+
+# -------------------- CHUNKERS --------------------
+class StructuredChunker:
+    """Packs each page's blocks into chunks of at most `chunk_tokens` tokens."""
+    name = "structured"
+
+    def __init__(self, chunk_tokens=CHUNK_TOKENS):
+        self.chunk_tokens = chunk_tokens
+        self.min_tokens = int(chunk_tokens * MIN_CHUNK_FRACTION)
+
+    @property
+    def signature(self):
+        return f"{self.name}:{self.chunk_tokens}"
+
+    def split_documents(self, docs):
+        chunks = []
+        for doc in docs:
+            chunks.extend(self._split(doc))
+        return chunks
+
+    def _split(self, doc):
+        text = doc.page_content
+        budget = self.chunk_tokens
+        spans = []              # (start, end, section)
+        start = end = None
+        tokens = 0
+        section = chunk_section = None
+        heading = None          # (start, tokens, end of the text before it) while a heading ends the chunk
+
+        def close(final=False):
+            nonlocal start, tokens, chunk_section, heading
+            if start is None:
+                return
+            if heading is not None and not final:
+                heading_start, heading_tokens, before = heading
+                if before is None:
+                    return      # only a heading so far: keep it with the block that follows
+                # Never end a chunk on a heading: it moves to the next chunk
+                spans.append((start, before, chunk_section))
+                start, tokens, chunk_section = heading_start, heading_tokens, section
+                heading = (heading_start, heading_tokens, None)
+                return
+            spans.append((start, end, chunk_section))
+            start, tokens, heading = None, 0, None
+
+        for kind, block_start, block_end in _blocks(text):
+            block_tokens = count_tokens(text[block_start:block_end])
+            if kind == "heading":
+                if tokens >= self.min_tokens or tokens + block_tokens > budget:
+                    close()
+                section = normalize_whitespace(text[block_start:block_end]).lstrip("# ")
+                if start is None:
+                    start, chunk_section = block_start, section
+                heading = (block_start, block_tokens, None if start == block_start else end)
+                end = block_end
+                tokens += block_tokens
+                continue
+
+            limit = max(1, budget - (heading[1] if heading else 0))
+            pieces = [(block_start, block_end)] if block_tokens <= limit else \
+                _pieces(text, block_start, block_end, kind, limit)
+            for piece_start, piece_end in pieces:
+                piece_tokens = block_tokens if len(pieces) == 1 else count_tokens(text[piece_start:piece_end])
+                if tokens + piece_tokens > budget:
+                    close()
+                if start is None:
+                    start, chunk_section = piece_start, section
+                end = piece_end
+                tokens += piece_tokens
+                heading = None
+        close(final=True)
+
+        chunks = []
+        for chunk_start, chunk_end, chunk_section in spans:
+            # Offsets point at the first and past the last non-space character
+            piece = text[chunk_start:chunk_end]
+            chunk_start += len(piece) - len(piece.lstrip())
+            chunk_end -= len(piece) - len(piece.rstrip())
+            if chunk_start >= chunk_end:
+                continue
+            extra = {"section": chunk_section} if chunk_section else {}
+            chunk = _annotate(doc, chunk_start, chunk_end, self.name, **extra)
+            chunk.metadata["tokens"] = count_tokens(chunk.page_content)
+            chunks.append(chunk)
+        return chunks
+
+
+class RecursiveChunker:
+    """The fixed-size character splitter, with the same per-chunk metadata."""
+    name = "recursive"
+
+    def __init__(self, chunk_chars=RECURSIVE_CHUNK_CHARS, overlap_chars=RECURSIVE_OVERLAP_CHARS):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        self.chunk_chars = chunk_chars
+        self.overlap_chars = overlap_chars
+        self._splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_chars, chunk_overlap=overlap_chars, length_function=len, add_start_index=True
+        )
+
+    @property
+    def signature(self):
+        return f"{self.name}:{self.chunk_chars}/{self.overlap_chars}"
+
+    def split_documents(self, docs):
+        chunks = []
+        for doc in docs:
+            for piece in self._splitter.split_documents([doc]):
+                start = piece.metadata["start_index"]
+                chunk = _annotate(doc, start, start + len(piece.page_content), self.name)
+                chunk.metadata["tokens"] = count_tokens(chunk.page_content)
+                chunks.append(chunk)
+        return chunks
+
+
+def get_chunker(strategy=DEFAULT_STRATEGY, model_name=None):
+    """Chunker for `strategy`, sized for the embedding model `model_name`."""
+    if strategy == "structured":
+        return StructuredChunker(chunk_tokens_for(model_name))
+    if strategy == "recursive":
+        return RecursiveChunker()
+    raise ValueError(f"Unknown chunking strategy '{strategy}', expected one of {STRATEGIES}")
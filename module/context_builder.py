@@ -0,0 +1,111 @@
+import os
+import re
+
+# -------------------- SETTINGS --------------------
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("DOCUMIND_CONTEXT_TOKENS", "1500"))
+CHARS_PER_TOKEN = 4      # rough average for English text with Llama-family tokenizers
+MIN_OVERLAP_CHARS = 40   # shorter shared edges are coincidence, not splitter overlap
+MAX_OVERLAP_CHARS = 400  # the splitter overlaps chunks by 300 characters
+
+_WHITESPACE = re.compile(r"\s+")
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """
+    Approximate number of model tokens in `text`.
+
+    Long words are split into several tokens and punctuation costs one each, so
+    the estimate takes the larger of the word/punctuation count and chars / 4.
+    """
+    return max(len(_TOKEN_PIECES.findall(text)), -(-len(text) // CHARS_PER_TOKEN))
+
+
+def normalize_whitespace(text):
+    """Collapse every run of whitespace (newlines included) to a single space."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _overlap(head, tail):
+    """Length of the longest suffix of `head` that `tail` starts with (0 if too short)."""
+    for size in range(min(len(head), len(tail), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+        if tail.startswith(head[-size:]):
+            return size
+    return 0
+
+
+def _dedupe(text, selected):
+    """
+    Remove from `text` what the already selected texts cover: None when it is
+    contained in one of them, otherwise `text` with the overlapping edges trimmed
+    and any selected text it fully contains elided.
+    """
+    for other in selected:
+        if text in other:
+            return None
+        if other in text:
+            text = text.replace(other, " … ")
+            continue
+        text = text[_overlap(other, text):]    # other chunk precedes this one
+        cut = _overlap(text, other)            # other chunk follows this one
+        if cut:
+            text = text[:-cut]
+        if not text.strip():
+            return None
+    return text.strip()
+
+
+def truncate_tokens(text, budget):
+    """Longest word-boundary prefix of `text` that fits in `budget` tokens."""
+    text = text[:budget * CHARS_PER_TOKEN + 1].rsplit(" ", 1)[0]
+    while text and count_tokens(text) > budget:
+        text = text[:int(len(text) * 0.9)].rsplit(" ", 1)[0]
+    return text
+
+
+def build_context(docs, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Pack retrieved chunks into a context block of at most `budget` tokens.
+
+    Chunks are taken by descending `metadata["score"]` (retrieval order when
+    unscored), whitespace is collapsed, text already covered by a higher ranked
+    chunk is dropped, and chunks that do not fit are skipped in favour of smaller
+    ones. The best chunk is truncated rather than dropped so the answer always has
+    some context. Returns (context, stats).
+    """
+    ranked = sorted(
+        enumerate(docs), key=lambda item: (-item[1].metadata.get("score", float("-inf")), item[0])
+    )
+
+    selected = []
+    used = duplicates = skipped = truncated = 0
+    for _, doc in ranked:
+        text = _dedupe(normalize_whitespace(doc.page_content), selected)
+        if not text:
+            duplicates += 1
+            continue
+
+        header = f"Document {len(selected) + 1}: "
+        cost = count_tokens(header + text) + 1  # +1 for the separator
+        if used + cost > budget:
+            if selected or budget - used <= count_tokens(header) + 1:
+                skipped += 1
+                continue
+            text = truncate_tokens(text, budget - used - count_tokens(header) - 1)
+            cost = count_tokens(header + text) + 1
+            truncated += 1
+
+        selected.append(text)
+        used += cost
+
+    context = "\n\n".join(f"Document {i + 1}: {text}" for i, text in enumerate(selected))
+    stats = {
+        "chunks_retrieved": len(docs),
+        "chunks_used": len(selected),
+        "duplicates_dropped": duplicates,
+        "chunks_skipped": skipped,
+        "truncated": truncated,
+        "context_tokens": count_tokens(context),
+        "budget_tokens": budget,
+    }
+    return context, stats
@@ -0,0 +1,144 @@
+import os
+import re
+import json
+import zlib
+import numpy as np
+from collections import Counter
+from module.chunking import content_hash
+
+# -------------------- SETTINGS --------------------
+DEDUP_ENABLED = os.environ.get("DOCUMIND_DEDUP", "1") != "0"
+SHINGLE_WORDS = 3
+# Chunks whose 64-bit SimHashes differ in at most this many bits are near-duplicates
+# (about 95% shared shingles); 0 keeps exact duplicate detection only.
+MAX_HAMMING_DISTANCE = int(os.environ.get("DOCUMIND_DEDUP_DISTANCE", "6"))
+# Split into distance + 1 bands, two fingerprints within the distance agree on at
+# least one band, so only chunks sharing a band need comparing.
+BANDS = MAX_HAMMING_DISTANCE + 1
+
+_WORD = re.compile(r"\w+")
+
+
+def _mix(x):
+    """splitmix64 finalizer, vectorized: spreads every input bit over the whole word."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def simhash(text):
+    """64-bit SimHash of the lowercased word shingles of `text`."""
+    # Words hash with CRC32 (stable across processes, unlike hash()); a shingle's
+    # hash is mixed from its words' hashes, so no shingle strings are built
+    words = np.array(
+        [zlib.crc32(word.encode("utf-8")) for word in _WORD.findall(text.lower())] or [0], dtype=np.uint64
+    )
+    shingles = _mix(words[:len(words) - SHINGLE_WORDS + 1] if len(words) >= SHINGLE_WORDS else words[:1])
+    for offset in range(1, min(SHINGLE_WORDS, len(words))):
+        shingles = _mix(shingles ^ words[offset:offset + len(shingles)])
+    bits = np.unpackbits(shingles.astype(">u8").view(np.uint8)).reshape(len(shingles), 64)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority).tobytes(), "big")
+
+
+def _bands(fingerprint):
+    width = 64 // BANDS
+    return [(fingerprint >> (band * width)) & ((1 << width) - 1) for band in range(BANDS)]
+
+
+def references(manifest):
+    """How many file entries of `manifest` refer to each chunk id."""
+    return Counter(chunk for entry in manifest["files"].values() for chunk in entry["chunk_ids"])
+
+
+class DedupIndex:
+    """
+    Content hash and SimHash of every chunk in a collection, keyed by docstore id,
+    so a new chunk can be matched to an indexed exact or near duplicate before it
+    is embedded. Supports incremental add/delete and persists as JSON.
+    """
+    def __init__(self):
+        self.fingerprints = {}                      # doc id -> (content hash, simhash)
+        self.hashes = {}                            # content hash -> doc id
+        self.bands = [{} for _ in range(BANDS)]     # band value -> set of doc ids
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def find(self, text, exact_only=()):
+        """
+        (doc id of a duplicate of `text` or None, content hash, simhash). Chunks in
+        `exact_only` only match identical text, never as near-duplicates.
+        """
+        text_hash, fingerprint = content_hash(text), simhash(text)
+        match = self.hashes.get(text_hash)
+        if match is None and MAX_HAMMING_DISTANCE:
+            candidates = set()
+            for band, value in zip(self.bands, _bands(fingerprint)):
+                candidates.update(band.get(value, ()))
+            for doc_id in sorted(candidates.difference(exact_only)):
+                if bin(self.fingerprints[doc_id][1] ^ fingerprint).count("1") <= MAX_HAMMING_DISTANCE:
+                    match = doc_id
+                    break
+        return match, text_hash, fingerprint
+
+    def deduplicate(self, docs, ids, exact_only=()):
+        """
+        Drop the chunks that duplicate an indexed chunk or an earlier one in `docs`.
+        Returns (docs to index, their ids, the id every input chunk is stored under:
+        its own or the one of the chunk it duplicates). `exact_only` is passed on to
+        `find()`: a file's previous version, whose edits must not be matched away.
+        """
+        kept_docs, kept_ids, stored_as = [], [], []
+        for doc, doc_id in zip(docs, ids):
+            match, text_hash, fingerprint = self.find(doc.page_content, exact_only)
+            if match is None:
+                self.add(doc_id, text_hash, fingerprint)
+                kept_docs.append(doc)
+                kept_ids.append(doc_id)
+            stored_as.append(match or doc_id)
+        return kept_docs, kept_ids, stored_as
+
+    def add(self, doc_id, text_hash, fingerprint):
+        self.delete([doc_id])
+        self.fingerprints[doc_id] = (text_hash, fingerprint)
+        self.hashes.setdefault(text_hash, doc_id)
+        for band, value in zip(self.bands, _bands(fingerprint)):
+            band.setdefault(value, set()).add(doc_id)
+
+    def delete(self, ids):
+        for doc_id in set(ids).intersection(self.fingerprints):
+            text_hash, fingerprint = self.fingerprints.pop(doc_id)
+            if self.hashes.get(text_hash) == doc_id:
+                del self.hashes[text_hash]
+            for band, value in zip(self.bands, _bands(fingerprint)):
+                members = band.get(value)
+                members.discard(doc_id)
+                if not members:
+                    del band[value]
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprints": self.fingerprints}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for doc_id, (text_hash, fingerprint) in data["fingerprints"].items():
+            index.add(doc_id, text_hash, fingerprint)
+        return index
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        """Build the dedup index for an existing vectorstore that has none yet."""
+        index = cls()
+        for doc_id in vectorstore.index_to_docstore_id.values():
+            text = vectorstore.docstore.search(doc_id).page_content
+            index.add(doc_id, content_hash(text), simhash(text))
+        return index
@@ -1,92 +1,583 @@
 import os
+import json
+import time
+import hashlib
+import httpx
+import numpy as np
+from contextlib import nullcontext
 import streamlit as st
-import pickle
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_ollama import OllamaEmbeddings
-from pypdf import PdfReader
-from pypdf.errors import PdfReadError
+from langchain_core.embeddings import Embeddings
+from ollama import ResponseError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from module import tracing
+from module.chunking import LEGACY_SIGNATURE, get_chunker
+from module.dedup import DEDUP_ENABLED, DedupIndex, references
+from module.embedding_cache import get_embedding_cache
+from module.extraction import iter_extracted
+from module.resources import get_embedder
+from module.scheduler import BULK, INTERACTIVE, get_scheduler
+from module.lexical_index import BM25Index
+from module.index_builder import apply_search_params, delete_from_vectorstore, optimize_vectorstore
+from module.vectorstore_io import (
+    CHUNKS_DB, FORMAT_VERSION, SQLiteDocstore, load_index_files, migrate_pickle_store, new_docstore,
+    remove_stale_files, write_index_files
+)
 
 # -------------------- PATHS --------------------
-VECTORSTORE_PATH = "vectorstore_data/vectorstore.faiss"
+VECTORSTORE_ROOT = "vectorstore_data"
+COLLECTIONS_DIR = os.path.join(VECTORSTORE_ROOT, "collections")
+VECTORSTORE_DIR = os.path.join(COLLECTIONS_DIR, "default")  # folder of the default collection
 EMBEDDINGS_PATH = "vectorstore_data/embeddings.pkl"
+MANIFEST_FILE = "manifest.json"
+LEXICAL_INDEX_FILE = "bm25.json"  # BM25 postings before format 3, imported by migrate_legacy_index
+DEDUP_INDEX_FILE = "dedup.json"
+LEGACY_INDEX_FILE = "index.faiss"  # FAISS.save_local output
 
+# -------------------- EMBEDDING PIPELINE --------------------
+EMBED_BATCH_SIZE = 64
+EMBED_MAX_WORKERS = 4
+EMBED_MAX_RETRIES = 3
+EMBED_RETRY_BACKOFF = 0.5  # seconds, doubled on every retry
+TRANSIENT_ERRORS = (httpx.HTTPError, ResponseError, ConnectionError, TimeoutError)
+INDEX_BATCH_SIZE = 256  # chunks embedded and appended to FAISS per step
 
 
-class CustomEmbeddings:
-    """Wrapper around OllamaEmbeddings for FAISS compatibility."""
-    def __init__(self, model_name="nomic-embed-text"):
-        self.embedder = OllamaEmbeddings(model=model_name)
+
+class CustomEmbeddings(Embeddings):
+    """
+    Wrapper around OllamaEmbeddings for FAISS compatibility, backed by the embedding cache.
+
+    Cache misses are split into batches of `batch_size` texts, embedded concurrently
+    by at most `max_workers` threads, retried with exponential backoff on transient
+    errors and reassembled in input order. `progress_callback(done, total, batch_rate)`
+    is called on the caller's thread after every finished batch.
+
+    Every call to Ollama takes a slot from the shared scheduler: document batches as
+    BULK work, query embeddings as INTERACTIVE work coalesced across sessions.
+    """
+    def __init__(self, model_name="nomic-embed-text", cache=None, batch_size=EMBED_BATCH_SIZE,
+                 max_workers=EMBED_MAX_WORKERS, max_retries=EMBED_MAX_RETRIES, progress_callback=None):
+        self.model_name = model_name
+        self.cache = cache if cache is not None else get_embedding_cache()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.progress_callback = progress_callback
+
+    @property
+    def embedder(self):
+        # Looked up on every use, so a backend swapped with use_backend() takes effect
+        return get_embedder(self.model_name)
 
     def embed_documents(self, texts):
-        return self.embedder.embed_documents(texts)
+        vectors = self.cache.get_many(self.model_name, texts)
+
+        # Embed each distinct missing text once
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        tracing.count("embedding_cache_hits", len(texts) - len(missing))
+        if missing:
+            tracing.count("embedding_cache_misses", len(missing))
+            with tracing.span("embed"):
+                new_vectors = self._embed_batched(missing)
+            by_text = dict(zip(missing, new_vectors))
+            vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+
+        return vectors
+
+    def _embed_batched(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            vectors, elapsed = self._embed_batch(batches[0])
+            if self.progress_callback:
+                self.progress_callback(len(texts), len(texts), len(texts) / max(elapsed, 1e-6))
+            return vectors
+
+        results = [None] * len(batches)
+        done = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            futures = {pool.submit(self._embed_batch, batch): i for i, batch in enumerate(batches)}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i], elapsed = future.result()
+                done += len(batches[i])
+                if self.progress_callback:
+                    self.progress_callback(done, len(texts), len(batches[i]) / max(elapsed, 1e-6))
+
+        return [vector for batch in results for vector in batch]
+
+    def _embed_batch(self, batch, priority=BULK):
+        """Embed one batch with retry; returns (vectors, seconds spent on the successful call)."""
+        gate = get_scheduler().embedding
+        for attempt in range(self.max_retries + 1):
+            try:
+                with gate.slot(priority=priority):
+                    start = time.perf_counter()
+                    vectors = self.embedder.embed_documents(batch)
+                break
+            except TRANSIENT_ERRORS:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(EMBED_RETRY_BACKOFF * (2 ** attempt))
+        elapsed = time.perf_counter() - start
+
+        # Persist per batch so a failed run keeps the work already done
+        self.cache.put_many(self.model_name, batch, vectors)
+        return vectors, elapsed
 
     def embed_query(self, query):
-        return self.embedder.embed_query(query)
+        cached = self.cache.get_many(self.model_name, [query])[0]
+        if cached is not None:
+            return cached
+        # Queries of every session using this instance are embedded in shared batches
+        return get_scheduler().query_batcher(self.model_name).embed(query, self._embed_queries)
+
+    def _embed_queries(self, texts):
+        return self._embed_batch(texts, priority=INTERACTIVE)[0]
 
     def __call__(self, text):
         if isinstance(text, list):
             return self.embed_documents(text)
         return self.embed_query(text)
-    
+
+# -------------------- MANIFEST --------------------
+def file_fingerprint(data):
+    """Content hash of an uploaded file, used to detect new or changed uploads."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_id(file_name, file_hash, index):
+    """Stable docstore id for the index-th chunk of a file version."""
+    return hashlib.sha1(f"{file_name}:{file_hash}:{index}".encode("utf-8")).hexdigest()
+
+
+def load_manifest(folder=VECTORSTORE_DIR):
+    """
+    Read the ingestion manifest: which file version is indexed under which chunk ids.
+    `version` increases every time the index changes.
+    """
+    path = os.path.join(folder, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"version": 0, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def index_version(folder=VECTORSTORE_DIR):
+    """Version of the persisted index; changes whenever its contents change."""
+    return load_manifest(folder)["version"]
+
+
+def has_index(manifest, folder=VECTORSTORE_DIR):
+    return manifest.get("format") == FORMAT_VERSION and os.path.exists(
+        os.path.join(folder, manifest["index_file"])
+    )
+
+
+def migrate_legacy_index(manifest, folder=VECTORSTORE_DIR):
+    """
+    Convert an older on-disk index to the current format: an index saved with
+    FAISS.save_local (pickled docstore) or one whose BM25 postings were a JSON file.
+    """
+    if manifest.get("format") == FORMAT_VERSION or not manifest["files"]:
+        return manifest
+    legacy_files = []
+    if not manifest.get("format"):
+        if not os.path.exists(os.path.join(folder, LEGACY_INDEX_FILE)):
+            return manifest
+        vectorstore = migrate_pickle_store(folder, CustomEmbeddings())
+        manifest.update(write_index_files(vectorstore, folder, manifest["version"]))
+        docstore = vectorstore.docstore
+        ids = list(vectorstore.index_to_docstore_id.values())
+        legacy_files = ["index.faiss", "index.pkl"]
+    else:
+        docstore = SQLiteDocstore(os.path.join(folder, CHUNKS_DB))
+        ids = [doc_id.decode() for doc_id in np.load(os.path.join(folder, manifest["ids_file"]))]
+
+    lexical_index = BM25Index(docstore)
+    json_path = os.path.join(folder, LEXICAL_INDEX_FILE)
+    if os.path.exists(json_path):
+        lexical_index.load_json(json_path)
+        legacy_files.append(LEXICAL_INDEX_FILE)
+    else:
+        lexical_index.rebuild(ids)
+    docstore.commit()
+    manifest["format"] = FORMAT_VERSION
+    save_manifest(manifest, folder)
+    for legacy_file in legacy_files:
+        os.remove(os.path.join(folder, legacy_file))
+    return manifest
+
+
+def load_vectorstore(embeddings, manifest=None, read_only=True, folder=VECTORSTORE_DIR):
+    """
+    Open the persisted index, restoring the search parameters of its index type.
+    Read-only stores are memory-mapped and fetch chunks lazily (see vectorstore_io).
+    """
+    manifest = manifest or load_manifest(folder)
+    vectorstore = load_index_files(folder, manifest, embeddings, read_only=read_only)
+    apply_search_params(vectorstore.index, manifest.get("index", {}))
+    return vectorstore
+
+
+def load_lexical_index(vectorstore, folder=VECTORSTORE_DIR):
+    """BM25 index over the vectorstore's chunk store; its postings are read per query, not loaded."""
+    return BM25Index(vectorstore.docstore)
+
+
+def load_dedup_index(vectorstore, folder=VECTORSTORE_DIR):
+    """Chunk fingerprints persisted next to the vectorstore, built from its docstore if missing."""
+    path = os.path.join(folder, DEDUP_INDEX_FILE)
+    if os.path.exists(path):
+        return DedupIndex.load(path)
+    return DedupIndex.from_vectorstore(vectorstore)
+
+
+def save_manifest(manifest, folder=VECTORSTORE_DIR):
+    path = os.path.join(folder, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+# -------------------- INDEX WRITER --------------------
+class IndexWriter:
+    """
+    Appends chunks to the FAISS index in batches of INDEX_BATCH_SIZE, so only one
+    batch of chunks and vectors is held in memory at a time. `on_update(vectorstore)`
+    is called after every batch lands in the index. The BM25 index is kept in
+    step with every write and delete, the dedup index with every delete (chunks
+    enter it before they are embedded). Deletes from the FAISS index are
+    collected and applied together on `flush()`, since HNSW deletes rebuild the
+    whole graph. `index_spec` describes the FAISS index type and `docstore`
+    receives the chunks if a new index has to be created.
+    """
+    def __init__(self, vectorstore, embeddings, lexical_index, index_spec=None, docstore=None, on_update=None,
+                 dedup_index=None):
+        self.vectorstore = vectorstore
+        self.docstore = docstore
+        self.index_spec = index_spec or {"type": "flat"}
+        self.embeddings = embeddings
+        self.lexical_index = lexical_index
+        self.dedup_index = dedup_index
+        self.on_update = on_update
+        self.indexed = 0
+        self._docs = []
+        self._ids = []
+        self._deleted = set()  # ids still to be removed from the FAISS index
+
+    def add(self, docs, ids):
+        if self._deleted.intersection(ids):
+            self._apply_deletes()  # a re-added id must not also match its stale vector
+        self._docs.extend(docs)
+        self._ids.extend(ids)
+        while len(self._docs) >= INDEX_BATCH_SIZE:
+            self._write(self._docs[:INDEX_BATCH_SIZE], self._ids[:INDEX_BATCH_SIZE])
+            del self._docs[:INDEX_BATCH_SIZE], self._ids[:INDEX_BATCH_SIZE]
+
+    def flush(self):
+        """Write the buffered chunks and apply the pending deletes."""
+        if self._docs:
+            self._write(self._docs, self._ids)
+            self._docs, self._ids = [], []
+        self._apply_deletes()
+
+    def delete(self, ids):
+        """Remove chunks whether they are still buffered or already indexed."""
+        ids = set(ids)
+        kept = [(d, i) for d, i in zip(self._docs, self._ids) if i not in ids]
+        self._docs = [d for d, _ in kept]
+        self._ids = [i for _, i in kept]
+
+        self._deleted.update(ids)
+        self.lexical_index.delete(ids)
+        if self.dedup_index is not None:
+            self.dedup_index.delete(ids)
+
+    def _apply_deletes(self):
+        if self.vectorstore is not None and self._deleted:
+            indexed = self._deleted.intersection(self.vectorstore.index_to_docstore_id.values())
+            if indexed:
+                with tracing.span("index_delete"):
+                    delete_from_vectorstore(self.vectorstore, self.index_spec, indexed)
+        self._deleted.clear()
+
+    def _write(self, docs, ids):
+        with tracing.span("index_write"):
+            self._add(docs, ids)
+        tracing.count("chunks_indexed", len(docs))
+        if self.on_update:
+            self.on_update(self.vectorstore)
+
+    def _add(self, docs, ids):
+        if self.vectorstore is None:
+            self.vectorstore = FAISS.from_documents(docs, self.embeddings, ids=ids, docstore=self.docstore)
+        else:
+            self.vectorstore.add_documents(docs, ids=ids)
+        self.lexical_index.add(ids, [doc.page_content for doc in docs])
+        self.indexed += len(docs)
+
 # -------------------- MAIN DOCUMENT PROCESSOR --------------------
-def process_documents(uploaded_files):
-    os.makedirs("vectorstore_data", exist_ok=True)
-    os.makedirs("temp_files", exist_ok=True)
-
-    # If vectorstore exists → load it directly (no need to reload embeddings)
-    if os.path.exists(VECTORSTORE_PATH):
-        st.info("Loading existing vectorstore from disk...")
-        vectorstore = FAISS.load_local(
-            "vectorstore_data",
-            CustomEmbeddings(),  # recreate embedding class
-            allow_dangerous_deserialization=True
-        )
-        return vectorstore
-
-    all_docs = []
-
-    with st.spinner("Extracting and processing uploaded documents..."):
-        for uploaded_file in uploaded_files:
-            temp_path = os.path.join("temp_files", uploaded_file.name)
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+def _save_version(vectorstore, dedup_index, manifest, folder, model_name):
+    """Persist the index as the next manifest version and drop what no version needs any more."""
+    manifest["version"] += 1
+    manifest["model"] = model_name
+    with tracing.span("save"):
+        manifest.update(write_index_files(vectorstore, folder, manifest["version"]))
+        dedup_index.save(os.path.join(folder, DEDUP_INDEX_FILE))
+        save_manifest(manifest, folder)
 
-            ext = os.path.splitext(uploaded_file.name)[1].lower()
+    # The new version is live → old chunks and index files can go
+    vectorstore.docstore.apply_deletes()
+    remove_stale_files(folder, manifest)
 
-            try:
-                if ext == ".pdf":
-                    with open(temp_path, "rb") as f:
-                        reader = PdfReader(f, strict=False)
-                        if len(reader.pages) == 0:
-                            raise ValueError("Empty or unreadable PDF")
-                    loader = PyPDFLoader(temp_path)
 
-                elif ext == ".txt":
-                    loader = TextLoader(temp_path, encoding="utf-8")
+def _update_sources(vectorstore, manifest, chunk_ids):
+    """Set `metadata["sources"]` of shared chunks to the files they occur in (dropped once only one is left)."""
+    sources = {chunk: [] for chunk in chunk_ids}
+    for file_name, entry in manifest["files"].items():
+        for chunk in sources.keys() & set(entry["chunk_ids"]):
+            sources[chunk].append(file_name)
 
-                else:
-                    st.warning(f"⚠ Unsupported file type: {uploaded_file.name}")
-                    continue
+    updated = {}
+    for chunk, files in sources.items():
+        doc = vectorstore.docstore.search(chunk)
+        if isinstance(doc, str):  # not found
+            continue
+        if len(files) > 1:
+            doc.metadata["sources"] = sorted(files)
+        elif doc.metadata.pop("sources", None) is None:
+            continue
+        updated[chunk] = doc
+    if updated:
+        vectorstore.docstore.add(updated)
 
-                docs = loader.load()
-                all_docs.extend(docs)
 
-            except Exception as e:
-                st.warning(f"⚠ Skipped {uploaded_file.name}: {e}")
-                continue
+def _orphan_ids(vectorstore, manifest):
+    """Chunks in the index that belong to no file in the manifest (left by an interrupted run)."""
+    known = {chunk for entry in manifest["files"].values() for chunk in entry["chunk_ids"]}
+    return set(vectorstore.index_to_docstore_id.values()) - known
+
+
+def process_documents(uploaded_files, on_update=None, folder=VECTORSTORE_DIR, on_warning=None,
+                      on_progress=None, should_stop=None, checkpoint_seconds=None, chunker=None):
+    """
+    Incrementally index the uploaded files into the collection stored in `folder`,
+    as a streaming pipeline.
+
+    Every upload is fingerprinted by content hash. Files already indexed with the same
+    hash are skipped; new and changed files flow page range by page range through
+    extraction → chunking → batched embedding → FAISS, so memory stays bounded by
+    the batch size and the index grows while later files are still being extracted.
+    A changed file's old chunks are dropped once its new version is fully indexed, and
+    files indexed with a different `chunker` (module.chunking) are chunked again.
+    Chunks that duplicate, exactly or nearly, one already in the collection are not
+    embedded (module.dedup): the file refers to the indexed copy, whose
+    `metadata["sources"]` lists every file it occurs in. Against a changed file's
+    previous version only identical chunks count, so edits are always indexed.
+    Returns (vectorstore, lexical index, manifest); the vectorstore is the
+    memory-mapped, read-only copy when a new version was saved. Skipped files are
+    reported through `on_warning(message)`, by default as Streamlit warnings.
+
+    For background use:
+    - `on_progress(event, file_name, info)` replaces the Streamlit status line; events
+      are "queued", "unchanged", "pages" (with the number of duplicate chunks),
+      "indexed", "failed" (per file), "embedding" and "checkpoint" (file_name None)
+    - `should_stop()` is polled between page ranges; once it returns True the files
+      finished so far are saved and the others dropped
+    - with `checkpoint_seconds`, finished files are saved as a new index version at
+      most that often, so readers see them early and an interrupted run loses only
+      the files after the last checkpoint (their uploads are simply re-indexed)
+    """
+    warn = on_warning or st.warning
+    temp_dir = os.path.join("temp_files", os.path.basename(os.path.normpath(folder)))
+    os.makedirs(folder, exist_ok=True)
+    os.makedirs(temp_dir, exist_ok=True)
+
+    status = None
+    busy = nullcontext()
+    if on_progress is None:
+        status = st.empty()
+        busy = st.spinner("Extracting and processing uploaded documents...")
+
+        def on_progress(event, file_name, info):
+            if event == "embedding":
+                status.markdown(
+                    f"Indexed {info['indexed']} chunks · embedding batch {info['done']}/{info['total']} "
+                    f"({info['rate']:.1f} chunks/s)"
+                )
+
+    manifest = load_manifest(folder)
+    vectorstore = None
+    writer = None
+
+    def report_progress(done, total, batch_rate):
+        on_progress("embedding", None, {"done": done, "total": total, "rate": batch_rate, "indexed": writer.indexed})
+
+    embeddings = CustomEmbeddings(progress_callback=report_progress)
+
+    # Ingestion mutates a private, in-memory copy; readers switch once it is saved.
+    # An index without a manifest has unknown contents → rebuild it from the uploads
+    manifest = migrate_legacy_index(manifest, folder)
+    docstore = None
+    if has_index(manifest, folder):
+        vectorstore = load_vectorstore(embeddings, manifest, read_only=False, folder=folder)
+        lexical_index = load_lexical_index(vectorstore, folder)
+        dedup_index = load_dedup_index(vectorstore, folder)
+    else:
+        manifest = {"version": manifest["version"], "files": {}}
+        dedup_index = DedupIndex()
+        docstore = new_docstore(folder)
+        lexical_index = BM25Index(docstore)
+        lexical_index.clear()
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=2000,
-        chunk_overlap=300,
-        length_function=len
+    writer = IndexWriter(
+        vectorstore, embeddings, lexical_index, manifest.get("index"), docstore=docstore, on_update=on_update,
+        dedup_index=dedup_index,
     )
-    split_docs = text_splitter.split_documents(all_docs)
+    chunker = chunker or get_chunker(model_name=embeddings.model_name)
+    changed = False
+
+    # A chunk is stored once and referenced by every file it occurs in (a file's
+    # "chunk_ids"); it is deleted when the last reference goes
+    refs = references(manifest)
+    shared = set()  # chunks whose set of files changed
+
+    def release(ids):
+        unused = []
+        for chunk in ids:
+            refs[chunk] -= 1
+            if refs[chunk] > 0:
+                shared.add(chunk)
+            else:
+                del refs[chunk]
+                unused.append(chunk)
+        writer.delete(unused)
+
+    def save():
+        writer.flush()
+        _update_sources(writer.vectorstore, manifest, [chunk for chunk in shared if chunk in refs])
+        _save_version(writer.vectorstore, dedup_index, manifest, folder, embeddings.model_name)
+
+    # A checkpoint may hold chunks of files that were still in progress
+    if manifest.pop("partial", False) and vectorstore is not None:
+        orphans = _orphan_ids(vectorstore, manifest)
+        if orphans:
+            writer.delete(orphans)
+            changed = True
+
+    with busy:
+        to_extract = []
+        hashes = {}
+        previous = {}  # chunks of the indexed version of a changed file
+        for uploaded_file in uploaded_files or []:
+            data = bytes(uploaded_file.getbuffer())
+            file_hash = file_fingerprint(data)
+            entry = manifest["files"].get(uploaded_file.name)
+
+            if entry and entry["hash"] == file_hash and entry.get("chunker", LEGACY_SIGNATURE) == chunker.signature:
+                tracing.count("files_unchanged")
+                on_progress("unchanged", uploaded_file.name, {"chunks": len(entry["chunk_ids"])})
+                continue
+
+            # Never let a file name (from an API client) point outside temp_dir
+            temp_path = os.path.join(temp_dir, os.path.basename(uploaded_file.name))
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            to_extract.append((uploaded_file.name, temp_path))
+            hashes[uploaded_file.name] = file_hash
+            previous[uploaded_file.name] = set(entry["chunk_ids"]) if entry else set()
+            on_progress("queued", uploaded_file.name, {})
+
+        new_ids = {file_name: [] for file_name in hashes}
+        last_checkpoint = time.monotonic()
+
+        # "extract" is the time spent waiting for the extraction workers
+        events = iter_extracted(to_extract)
+        for event, file_name, payload in tracing.traced_iter(events, "extract"):
+            if event == "pages":
+                # Ids are derived from the first page of the range, so they don't
+                # depend on the order in which ranges finish, and from the chunker, so
+                # re-chunking a file never reuses the ids of its previous chunks
+                with tracing.span("split"):
+                    split_docs = chunker.split_documents(payload)
+                first_page = payload[0].metadata.get("page", 0) if payload else 0
+                ids = [
+                    chunk_id(file_name, hashes[file_name], f"{chunker.signature}:{first_page}:{i}")
+                    for i in range(len(split_docs))
+                ]
+                stored_as = ids
+                if DEDUP_ENABLED:
+                    # Before embedding: duplicates of indexed chunks are only referenced.
+                    # A changed file's old chunks only count when identical, else an
+                    # edit would be matched back to the text it replaces
+                    with tracing.span("dedup"):
+                        split_docs, ids, stored_as = dedup_index.deduplicate(
+                            split_docs, ids, exact_only=previous[file_name]
+                        )
+                    shared.update(chunk for chunk in stored_as if chunk in refs)
+                    tracing.count("chunks_deduplicated", len(stored_as) - len(ids))
+                writer.add(split_docs, ids)
+                refs.update(stored_as)
+                new_ids[file_name].extend(stored_as)
+                on_progress("pages", file_name, {
+                    "pages": len(payload), "chunks": len(stored_as), "duplicates": len(stored_as) - len(ids)
+                })
+
+            elif payload is not None:
+                warn(f"⚠ Skipped {file_name}: {payload}")
+                tracing.count("files_failed")
+                release(new_ids.pop(file_name, []))
+                on_progress("failed", file_name, {"error": str(payload)})
+
+            else:
+                # Changed file → drop the chunks of its previous version
+                entry = manifest["files"].get(file_name)
+                if entry and entry["chunk_ids"]:
+                    release(entry["chunk_ids"])
+
+                manifest["files"][file_name] = {
+                    "hash": hashes[file_name], "chunker": chunker.signature, "chunk_ids": new_ids.pop(file_name)
+                }
+                changed = True
+                on_progress("indexed", file_name, {"chunks": len(manifest["files"][file_name]["chunk_ids"])})
+
+                # Nothing to save while no chunk has been indexed yet (e.g. only a
+                # scanned PDF without text has finished so far)
+                due = checkpoint_seconds is not None and time.monotonic() - last_checkpoint >= checkpoint_seconds
+                if due and writer.vectorstore is None:
+                    writer.flush()
+                if due and writer.vectorstore is not None:
+                    if any(new_ids.values()):
+                        manifest["partial"] = True
+                    save()
+                    manifest.pop("partial", None)
+                    last_checkpoint = time.monotonic()
+                    on_progress("checkpoint", None, {"version": manifest["version"]})
+
+            if should_stop is not None and should_stop():
+                events.close()
+                # Drop the chunks of files that did not finish
+                for ids in new_ids.values():
+                    release(ids)
+                break
+
+        writer.flush()
+        vectorstore = writer.vectorstore
+
+    if status is not None:
+        status.empty()
 
-    embeddings = CustomEmbeddings()
+    if changed and vectorstore is not None:
+        # Switch index type (flat → HNSW → IVF-PQ) once the corpus size calls for it
+        with tracing.span("optimize"):
+            manifest["index"] = optimize_vectorstore(vectorstore, manifest.get("index"))
+        save()
 
-    vectorstore = FAISS.from_documents(split_docs, embeddings)
-    vectorstore.save_local("vectorstore_data")
+        # Serve the memory-mapped copy and let the private in-memory one be freed
+        embeddings.progress_callback = None
+        with tracing.span("reload"):
+            vectorstore = load_vectorstore(embeddings, manifest, folder=folder)
+        lexical_index = load_lexical_index(vectorstore, folder)
 
-    return vectorstore
\ No newline at end of file
+    return vectorstore, lexical_index, manifest
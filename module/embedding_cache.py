@@ -0,0 +1,146 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+# -------------------- PATHS --------------------
+CACHE_PATH = "vectorstore_data/embedding_cache.sqlite"
+MAX_ENTRIES = 200_000
+EVICT_TO = 0.95              # eviction trims the cache to this fraction of max_entries
+TOUCH_FLUSH_ENTRIES = 1000   # buffered last-used updates written together
+TOUCH_FLUSH_SECONDS = 60.0
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model name, chunk text hash).
+
+    Vectors are stored as float32 blobs in SQLite. Entries carry a last-used
+    timestamp and the least recently used ones are evicted once the cache
+    grows past `max_entries`. Lookups never write: last-used times are buffered
+    and written with the next insert, or once enough have piled up.
+    """
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, key)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        self._touched = {}  # (model, key) -> last used, not yet written
+        self._touched_since = time.monotonic()
+
+    def get_many(self, model, texts):
+        """Return a list aligned with `texts`: the cached vector, or None on a miss."""
+        keys = [text_hash(t) for t in texts]
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._touched.update(((model, k), now) for k in found)
+                if (len(self._touched) >= TOUCH_FLUSH_ENTRIES
+                        or time.monotonic() - self._touched_since >= TOUCH_FLUSH_SECONDS):
+                    self._write_touched()
+                    self._conn.commit()
+
+            results = []
+            for k in keys:
+                blob = found.get(k)
+                if blob is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(np.frombuffer(blob, dtype=np.float32).tolist())
+        return results
+
+    def put_many(self, model, texts, vectors):
+        now = time.time()
+        rows = [
+            (model, text_hash(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            # Same text and model → same vector, so an existing row is left as it is
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, key, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            self._count += max(inserted, 0)
+            self._write_touched()
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _write_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                [(used, model, key) for (model, key), used in self._touched.items()],
+            )
+            self._touched = {}
+        self._touched_since = time.monotonic()
+
+    def _evict(self):
+        # Other processes may share the file: recount before deleting anything
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = self._count - int(self.max_entries * EVICT_TO)
+        if self._count > self.max_entries and overflow > 0:
+            deleted = self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            ).rowcount
+            self._count -= deleted
+
+    def stats(self):
+        with self._lock:
+            count = self._count
+        total = self.hits + self.misses
+        return {
+            "entries": count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide embedding cache shared by every CustomEmbeddings instance."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
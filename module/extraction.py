@@ -0,0 +1,171 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from langchain_core.documents import Document
+
+# -------------------- SETTINGS --------------------
+PAGES_PER_TASK = 25  # PDFs longer than this are split into page ranges
+MAX_WORKERS = os.cpu_count() or 2
+MAX_IN_FLIGHT = MAX_WORKERS * 2  # bounds extracted-but-unconsumed text
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+
+# -------------------- WORKERS (run in child processes) --------------------
+# pypdf is imported inside the workers: the parent process never opens a PDF, it
+# only schedules page ranges
+def _read_pages(reader, path, start, end):
+    return [(reader.pages[i].extract_text() or "", {"source": path, "page": i}) for i in range(start, end)]
+
+
+def _extract_pdf_head(path):
+    """
+    First task of a PDF: count its pages and extract the first page range.
+    Returns (pages, page count); the parent plans the other ranges from the count.
+    """
+    from pypdf import PdfReader
+    with open(path, "rb") as f:
+        reader = PdfReader(f, strict=False)
+        page_count = len(reader.pages)
+        if page_count == 0:
+            raise ValueError("Empty or unreadable PDF")
+        return _read_pages(reader, path, 0, min(PAGES_PER_TASK, page_count)), page_count
+
+
+def _extract_pdf_pages(path, start, end):
+    """Extract text of pages [start, end) as (text, metadata) pairs."""
+    from pypdf import PdfReader
+    with open(path, "rb") as f:
+        return _read_pages(PdfReader(f, strict=False), path, start, end)
+
+
+def _extract_text_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [(f.read(), {"source": path})]
+
+
+# -------------------- POOL --------------------
+_pool = None
+
+
+def _get_pool():
+    """Long-lived process pool, so worker start-up is paid once per server process."""
+    global _pool
+    if _pool is None:
+        # spawn: never fork the threaded Streamlit server
+        _pool = ProcessPoolExecutor(
+            max_workers=MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+# -------------------- PUBLIC API --------------------
+def _plan_files(files):
+    """
+    Yield (file_name, tasks, error) per file, where tasks are (fn, args) pairs.
+    A PDF starts as a single _extract_pdf_head task; its other page ranges are
+    planned by _more_pdf_ranges once that task has counted the pages.
+    """
+    for file_name, path in files:
+        ext = os.path.splitext(file_name)[1].lower()
+        if ext not in SUPPORTED_EXTENSIONS:
+            yield file_name, None, ValueError(f"Unsupported file type: {file_name}")
+        elif ext == ".txt":
+            yield file_name, [(_extract_text_file, (path,))], None
+        else:
+            yield file_name, [(_extract_pdf_head, (path,))], None
+
+
+def _more_pdf_ranges(path, page_count):
+    """Tasks for the page ranges after the one _extract_pdf_head extracted."""
+    return [
+        (_extract_pdf_pages, (path, start, min(start + PAGES_PER_TASK, page_count)))
+        for start in range(PAGES_PER_TASK, page_count, PAGES_PER_TASK)
+    ]
+
+
+def iter_extracted(files):
+    """
+    Stream LangChain documents out of `files`, a list of (file_name, path) pairs.
+
+    Files and page ranges of long PDFs are fanned out over a process pool, with at
+    most MAX_IN_FLIGHT tasks outstanding so extracted text never piles up faster
+    than the caller consumes it. Yields events in completion order:
+
+    - ("pages", file_name, docs): a finished page range, PyPDFLoader-style metadata
+    - ("done", file_name, error): every range of the file is finished; `error` is
+      None on success, otherwise the first failure of that file only
+    """
+    pool = _get_pool()
+    plan = _plan_files(files)
+    queue = deque()  # (file_name, fn, args) not yet submitted
+    in_flight = {}   # future -> (file name, fn, args)
+    remaining = {}   # file name -> unfinished tasks
+    failed = {}
+
+    try:
+        while True:
+            # Top up the window of outstanding tasks, planning files lazily
+            while len(in_flight) < MAX_IN_FLIGHT:
+                if not queue:
+                    item = next(plan, None)
+                    if item is None:
+                        break
+                    file_name, tasks, error = item
+                    if error is not None:
+                        yield "done", file_name, error
+                        continue
+                    remaining[file_name] = len(tasks)
+                    queue.extend((file_name, fn, args) for fn, args in tasks)
+                    continue
+
+                file_name, fn, args = queue.popleft()
+                try:
+                    future = pool.submit(fn, *args)
+                except BrokenProcessPool:
+                    _reset_pool()
+                    pool = _get_pool()
+                    future = pool.submit(fn, *args)
+                in_flight[future] = (file_name, fn, args)
+
+            if not in_flight:
+                return
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_name, fn, args = in_flight.pop(future)
+                try:
+                    pages = future.result()
+                    if fn is _extract_pdf_head:
+                        pages, page_count = pages
+                        # Ahead of other files' tasks, so this file finishes first
+                        more = _more_pdf_ranges(args[0], page_count)
+                        queue.extendleft((file_name, f, a) for f, a in reversed(more))
+                        remaining[file_name] += len(more)
+                except BrokenProcessPool as e:
+                    _reset_pool()
+                    pool = _get_pool()
+                    failed.setdefault(file_name, e)
+                except Exception as e:
+                    failed.setdefault(file_name, e)
+                else:
+                    if file_name not in failed:
+                        yield "pages", file_name, [Document(page_content=text, metadata=meta) for text, meta in pages]
+
+                remaining[file_name] -= 1
+                if remaining[file_name] == 0:
+                    del remaining[file_name]
+                    yield "done", file_name, failed.pop(file_name, None)
+    finally:
+        # Closed early (e.g. a cancelled ingestion) → don't start what is still queued
+        for future in in_flight:
+            future.cancel()
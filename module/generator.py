@@ -1,20 +1,27 @@
-from langchain_community.llms import Ollama
+import time
+import logging
+from module import tracing
+from module.resources import get_llm
+from module.answer_cache import get_answer_cache
+from module.scheduler import get_scheduler
+from module.context_builder import CONTEXT_TOKEN_BUDGET, build_context, count_tokens
+from module.memory import get_memory
 
+logger = logging.getLogger(__name__)
 
-def get_answer(user_query, retriever, session_state):
-    # Step 1: Retrieve relevant docs
-    docs = retriever.get_relevant_documents(user_query)
+NO_DOCUMENTS_REPLY = "I couldn’t find any relevant information in the uploaded documents."
+CACHED_ANSWER_NOTE = "*♻ Cached answer to a previous, similar question.*\n\n"
 
-    if not docs:
-        return "I couldn’t find any relevant information in the uploaded documents."
 
-    # Step 2: Format context
-    context = "\n\n".join(
-        [f"Document {i+1}:\n{doc.page_content}" for i, doc in enumerate(docs)]
-    )
-    context = context.replace("\n", " ").replace("  ", " ")
+def build_prompt(user_query, docs, budget=CONTEXT_TOKEN_BUDGET, conversation=""):
+    """
+    Returns (prompt, stats); the context is packed into `budget` tokens by
+    build_context, `conversation` is the bounded chat memory (module.memory).
+    """
+    context, stats = build_context(docs, budget)
+    if conversation:
+        conversation = f"\nConversation so far:\n{conversation}\n"
 
-    # Step 3: Construct prompt
     prompt = f"""
 You are DocuMind — an intelligent assistant that answers based only on the provided documents.
 
@@ -27,15 +34,107 @@ Your task:
 
 Context:
 {context}
-
+{conversation}
 Question:
 {user_query}
 
 Answer:
 """
+    stats["memory_tokens"] = count_tokens(conversation)
+    stats["prompt_tokens"] = count_tokens(prompt)
+    return prompt, stats
+
+
+def stream_answer(user_query, retriever, session_state):
+    """
+    Yield the answer token by token as Ollama generates it.
+
+    Answers are served from the semantic answer cache when the same or a
+    near-identical question was already answered against the same index version;
+    such replies start with CACHED_ANSWER_NOTE.
+
+    Follow-up questions are answered in the context of `session_state["chat_history"]`:
+    the question is rewritten into a standalone one for caching and retrieval, and a
+    bounded summary of the chat goes into the prompt (module.memory).
+
+    Generation waits for a slot from the shared scheduler, queued fairly against
+    other sessions by `session_state["session_id"]`. Every call is recorded as an
+    "answer" trace.
+    """
+    trace = tracing.Trace(
+        "answer", collection=getattr(retriever, "collection", None), mode=getattr(retriever, "mode", None)
+    )
+    try:
+        yield from _answer_tokens(user_query, retriever, session_state, trace)
+    except GeneratorExit:
+        trace.finish("cancelled")  # the reader stopped consuming the stream
+        raise
+    except Exception:
+        trace.finish("error")
+        raise
+    finally:
+        trace.finish()
 
-    # Step 4: Generate answer
-    llm = Ollama(model="llama3.2", temperature=0.3)
-    answer = llm(prompt)
 
-    return answer
+def _answer_tokens(user_query, retriever, session_state, trace):
+    # The trace is only activated around synchronous steps: a context variable
+    # must not stay set across a yield
+    # Step 0: Resolve follow-ups against the conversation
+    history = session_state.get("chat_history") or []
+    session_id = session_state.get("session_id")
+    memory = get_memory(session_state)
+    with trace.activate():
+        memory.update(history, session_id)
+        query = memory.standalone_query(user_query, history, session_id)
+    if query != user_query:
+        trace.attrs["rewritten"] = True
+        logger.info("follow-up %r rewritten to %r", user_query, query)
+    session_state["last_query"] = query
+
+    # Step 1: Check the answer cache (the query embedding is reused by retrieval)
+    cache = get_answer_cache(getattr(retriever, "collection", None))
+    index_version = getattr(retriever, "index_version", None)
+    with trace.activate():
+        with tracing.span("embed_query"):
+            query_vector = retriever.vectorstore.embeddings.embed_query(query)
+        cached = cache.lookup(index_version, query_vector)
+        tracing.count("answer_cache_hits" if cached is not None else "answer_cache_misses")
+    if cached is not None:
+        trace.attrs["cached"] = True
+        yield CACHED_ANSWER_NOTE + cached
+        return
+
+    # Step 2: Retrieve relevant docs
+    with trace.activate():
+        docs = retriever.get_relevant_documents(query)
+
+    if not docs:
+        yield NO_DOCUMENTS_REPLY
+        return
+
+    # Step 3: Construct prompt
+    with trace.span("build_prompt"):
+        prompt, prompt_stats = build_prompt(query, docs, conversation=memory.context(history))
+    session_state["last_prompt_stats"] = prompt_stats
+    trace.attrs["prompt_tokens"] = prompt_stats["prompt_tokens"]
+    logger.info("prompt %s", prompt_stats)
+
+    # Step 4: Stream answer
+    llm = get_llm("llama3.2", temperature=0.3)
+    tokens = []
+    wait_start = time.perf_counter()
+    with get_scheduler().generation.slot(session=session_id):
+        trace.add_span("generation_wait", (time.perf_counter() - wait_start) * 1000, wait_start)
+        with trace.span("generate"):
+            start = time.perf_counter()
+            for token in llm.stream(prompt):
+                if not tokens:
+                    trace.add_span("first_token", (time.perf_counter() - start) * 1000, start)
+                tokens.append(token)
+                yield token
+
+    cache.store(index_version, query, query_vector, "".join(tokens))
+
+
+def get_answer(user_query, retriever, session_state):
+    return "".join(stream_answer(user_query, retriever, session_state))
@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import faiss
+import numpy as np
+
+# -------------------- INDEX TYPES --------------------
+# flat  → exact search, float32 storage (default for small corpora)
+# sq8   → exact scan over 8-bit scalar-quantized vectors, 4x less memory
+# hnsw  → graph index, sub-linear search, float32 storage
+# ivf   → inverted lists probed with `nprobe`, float32 storage
+# ivfpq → inverted lists over product-quantized codes, for very large corpora
+INDEX_TYPES = ("flat", "sq8", "hnsw", "ivf", "ivfpq")
+DEFAULT_INDEX_TYPE = os.environ.get("DOCUMIND_INDEX_TYPE", "auto")
+
+# "auto" thresholds, in number of vectors
+FLAT_MAX_VECTORS = 50_000
+HNSW_MAX_VECTORS = 500_000
+IVF_MIN_VECTORS = 1_000  # below this IVF/PQ training is meaningless → flat
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 32
+PQ_BITS = 8
+TRAIN_SAMPLE_PER_LIST = 64   # training vectors per IVF list
+RECONSTRUCT_BATCH = 65_536   # vectors copied per step when rebuilding
+
+
+def _trainable(index_type, n_vectors):
+    return index_type not in ("ivf", "ivfpq") or n_vectors >= IVF_MIN_VECTORS
+
+
+def choose_index_type(n_vectors, requested=DEFAULT_INDEX_TYPE):
+    if requested != "auto":
+        if requested not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{requested}', expected 'auto' or one of {INDEX_TYPES}")
+        return requested if _trainable(requested, n_vectors) else "flat"
+    if n_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivfpq"
+
+
+def make_spec(index_type, n_vectors, dim):
+    """Build parameters for `index_type`, sized for `n_vectors` vectors of `dim` dimensions."""
+    spec = {"type": index_type, "dim": dim}
+    if index_type == "hnsw":
+        spec.update(m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef_search=HNSW_EF_SEARCH)
+    elif index_type in ("ivf", "ivfpq"):
+        # ~4·sqrt(n) lists, but never more lists than training data supports
+        nlist = int(4 * np.sqrt(max(n_vectors, 1)))
+        spec.update(nlist=max(1, min(nlist, n_vectors // 39 or 1)), nprobe=IVF_NPROBE)
+        if index_type == "ivfpq":
+            spec.update(pq_m=_pq_subquantizers(dim), pq_bits=PQ_BITS)
+    return spec
+
+
+def _pq_subquantizers(dim):
+    """Largest common sub-quantizer count that divides `dim`, aiming at 8 dims per code byte."""
+    for m in (96, 64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if m <= dim // 4 and dim % m == 0:
+            return m
+    return 1
+
+
+def empty_index(spec):
+    """Untrained, empty FAISS index (L2 metric, like LangChain's default) for `spec`."""
+    dim = spec["dim"]
+    if spec["type"] == "flat":
+        return faiss.IndexFlatL2(dim)
+    if spec["type"] == "sq8":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+    if spec["type"] == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, spec["m"])
+        index.hnsw.efConstruction = spec["ef_construction"]
+        return index
+    quantizer = faiss.IndexFlatL2(dim)
+    if spec["type"] == "ivf":
+        return faiss.IndexIVFFlat(quantizer, dim, spec["nlist"])
+    return faiss.IndexIVFPQ(quantizer, dim, spec["nlist"], spec["pq_m"], spec["pq_bits"])
+
+
+def apply_search_params(index, spec):
+    """Restore query-time parameters, which are tuned per deployment rather than baked in."""
+    if spec.get("type") == "hnsw":
+        index.hnsw.efSearch = spec["ef_search"]
+    elif spec.get("type") in ("ivf", "ivfpq"):
+        index.nprobe = spec["nprobe"]
+        # Positions must stay reconstructable for re-scoring, rebuilds and deletes
+        if index.direct_map.type == faiss.DirectMap.NoMap:
+            index.make_direct_map()
+    return index
+
+
+def _iter_vectors(index, positions=None):
+    """Reconstruct stored vectors in bounded batches, in position order."""
+    if positions is None:
+        for start in range(0, index.ntotal, RECONSTRUCT_BATCH):
+            yield index.reconstruct_n(start, min(RECONSTRUCT_BATCH, index.ntotal - start))
+        return
+    for start in range(0, len(positions), RECONSTRUCT_BATCH):
+        yield np.vstack([index.reconstruct(int(p)) for p in positions[start:start + RECONSTRUCT_BATCH]])
+
+
+def build_index(spec, source_index, positions=None):
+    """New index of type `spec` holding the vectors of `source_index` (optionally only `positions`)."""
+    index = empty_index(spec)
+    if not index.is_trained:
+        n = source_index.ntotal if positions is None else len(positions)
+        centroids = max(spec.get("nlist", 1), 2 ** spec.get("pq_bits", 0))
+        sample_size = min(n, centroids * TRAIN_SAMPLE_PER_LIST)
+        candidates = np.arange(source_index.ntotal) if positions is None else np.asarray(positions)
+        sample = np.random.default_rng(0).choice(candidates, size=sample_size, replace=False)
+        index.train(np.vstack([source_index.reconstruct(int(p)) for p in np.sort(sample)]))
+    apply_search_params(index, spec)
+    for batch in _iter_vectors(source_index, positions):
+        index.add(batch)
+    return index
+
+
+def supports_compacting_delete(index):
+    """Flat-code indexes renumber positions on remove_ids, which LangChain's FAISS.delete relies on."""
+    return isinstance(index, faiss.IndexFlatCodes)
+
+
+def _remove_from_ivf(index, positions):
+    """
+    Remove `positions` from an IVF index in place and renumber the remaining
+    vectors 0..n-1 in their inverted lists, so positions stay contiguous.
+    """
+    kept = np.setdiff1d(np.arange(index.ntotal, dtype="int64"), positions)
+    index.set_direct_map_type(faiss.DirectMap.NoMap)  # remove_ids needs no (or a hashed) direct map
+    index.remove_ids(np.asarray(positions, dtype="int64"))
+    lists = index.invlists
+    for list_no in range(index.nlist):
+        n = lists.list_size(list_no)
+        if not n:
+            continue
+        labels = faiss.rev_swig_ptr(lists.get_ids(list_no), n)
+        codes = faiss.rev_swig_ptr(lists.get_codes(list_no), n * lists.code_size).copy()
+        renumbered = np.searchsorted(kept, labels).astype("int64")
+        lists.update_entries(list_no, 0, n, faiss.swig_ptr(renumbered), faiss.swig_ptr(codes))
+    index.make_direct_map()
+
+
+def delete_from_vectorstore(vectorstore, spec, ids):
+    """
+    Delete docstore ids from a LangChain FAISS vectorstore of any index type.
+
+    Flat-code indexes use FAISS.delete directly and IVF indexes remove the
+    vectors in place and renumber the rest. HNSW cannot remove vectors, so
+    the kept ones are added to an empty copy of the index; callers batch
+    their deletes to rebuild it once.
+    """
+    if supports_compacting_delete(vectorstore.index):
+        vectorstore.delete(list(ids))
+        return
+
+    ids = set(ids)
+    kept = [(position, doc_id) for position, doc_id in sorted(vectorstore.index_to_docstore_id.items())
+            if doc_id not in ids]
+    if isinstance(vectorstore.index, faiss.IndexIVF):
+        removed = [position for position, doc_id in vectorstore.index_to_docstore_id.items() if doc_id in ids]
+        _remove_from_ivf(vectorstore.index, removed)
+    else:
+        index = faiss.clone_index(vectorstore.index)
+        index.reset()
+        apply_search_params(index, spec)
+        for batch in _iter_vectors(vectorstore.index, [position for position, _ in kept]):
+            index.add(batch)
+        vectorstore.index = index
+
+    vectorstore.docstore.delete(list(ids))
+    vectorstore.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(kept)}
+
+
+def optimize_vectorstore(vectorstore, spec=None, requested=DEFAULT_INDEX_TYPE):
+    """
+    Rebuild the vectorstore's index if its size calls for a different index type.
+    Returns the spec in effect, to be persisted with the index.
+    """
+    n, dim = vectorstore.index.ntotal, vectorstore.index.d
+    index_type = choose_index_type(n, requested)
+    current = spec or {"type": "flat", "dim": dim}
+    if index_type == current["type"]:
+        return current
+
+    new_spec = make_spec(index_type, n, dim)
+    vectorstore.index = build_index(new_spec, vectorstore.index)
+    return new_spec
+
+
+# -------------------- RECALL / LATENCY REPORT --------------------
+def recall_report(vectorstore, index_types=INDEX_TYPES, n_queries=200, k=10):
+    """
+    Recall@k and mean query latency of each index type against the exact flat
+    baseline, using perturbed copies of stored vectors as queries.
+    """
+    source = vectorstore.index
+    n = source.ntotal
+    if n == 0:
+        return {}
+    vectors = np.vstack(list(_iter_vectors(source)))
+    flat = faiss.IndexFlatL2(source.d)
+    flat.add(vectors)
+
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(n, size=min(n_queries, n), replace=False)]
+    queries = queries + rng.normal(scale=0.01, size=queries.shape).astype(np.float32)
+    k = min(k, n)
+    _, truth = flat.search(queries, k)
+
+    report = {}
+    for index_type in index_types:
+        if not _trainable(index_type, n):
+            report[index_type] = {"skipped": f"needs at least {IVF_MIN_VECTORS} vectors"}
+            continue
+        spec = make_spec(index_type, n, source.d)
+        build_start = time.perf_counter()
+        index = build_index(spec, flat)
+        build_seconds = time.perf_counter() - build_start
+
+        search_start = time.perf_counter()
+        _, found = index.search(queries, k)
+        latency_ms = (time.perf_counter() - search_start) * 1000 / len(queries)
+
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        report[index_type] = {
+            "spec": spec,
+            f"recall@{k}": round(float(recall), 4),
+            "latency_ms": round(latency_ms, 4),
+            "build_s": round(build_seconds, 3),
+            "index_bytes": int(faiss.serialize_index(index).size),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    # python -m module.index_builder [collection name or folder]
+    import argparse
+    from module.document_processor import (
+        COLLECTIONS_DIR, MANIFEST_FILE, CustomEmbeddings, has_index, load_manifest, load_vectorstore
+    )
+
+    parser = argparse.ArgumentParser(description="Recall and latency of each FAISS index type on a collection")
+    parser.add_argument("collection", nargs="?", default="default",
+                        help="collection name, or the path of a collection folder (default: %(default)s)")
+    args = parser.parse_args()
+
+    folder = args.collection
+    if not os.path.exists(os.path.join(folder, MANIFEST_FILE)):
+        folder = os.path.join(COLLECTIONS_DIR, args.collection)
+    manifest = load_manifest(folder)
+    if not has_index(manifest, folder):
+        parser.error(f"no index in {folder} (an index in an older format is converted once the app opens it)")
+    print(json.dumps(recall_report(load_vectorstore(CustomEmbeddings(), manifest, folder=folder)), indent=2))
@@ -0,0 +1,191 @@
+import os
+import re
+import glob
+import shutil
+import threading
+from collections import OrderedDict
+from module import tracing
+from module.utilities import FileLock
+from module.vectorstore_io import FORMAT_VERSION
+from module.document_processor import (
+    COLLECTIONS_DIR, MANIFEST_FILE, VECTORSTORE_ROOT, CustomEmbeddings,
+    has_index, load_lexical_index, load_manifest, load_vectorstore, migrate_legacy_index, process_documents
+)
+
+# -------------------- SETTINGS --------------------
+DEFAULT_COLLECTION = "default"
+MEMORY_BUDGET_BYTES = int(os.environ.get("DOCUMIND_INDEX_MEMORY_BUDGET_MB", "2048")) * 1024 * 1024
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+INGEST_LOCK_FILE = "ingest.lock"
+
+
+class LoadedCollection:
+    """A collection's vectorstore and BM25 index at one manifest version."""
+    def __init__(self, name, version, vectorstore, lexical_index, nbytes):
+        self.name = name
+        self.version = version
+        self.vectorstore = vectorstore
+        self.lexical_index = lexical_index
+        self.nbytes = nbytes
+
+
+class IndexManager:
+    """
+    Named document collections, each in its own folder under COLLECTIONS_DIR with
+    its own manifest.
+
+    Collections are loaded lazily on first use and shared by every session in the
+    process. Least recently used collections are dropped from memory once the
+    loaded ones exceed `memory_budget` bytes (estimated from their index files);
+    they are simply reloaded on the next query.
+    """
+    def __init__(self, root=COLLECTIONS_DIR, memory_budget=MEMORY_BUDGET_BYTES):
+        self.root = root
+        self.memory_budget = memory_budget
+        self._loaded = OrderedDict()  # name -> LoadedCollection
+        self._manifests = {}          # folder -> (manifest.json stat, manifest)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def collection_dir(self, name):
+        if not COLLECTION_NAME.match(name or ""):
+            raise ValueError("Collection names may only contain letters, digits, '-' and '_' (max 64).")
+        return os.path.join(self.root, name)
+
+    def list_collections(self):
+        names = {DEFAULT_COLLECTION}
+        names.update(
+            entry for entry in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, entry)) and COLLECTION_NAME.match(entry)
+        )
+        return sorted(names)
+
+    def create_collection(self, name):
+        os.makedirs(self.collection_dir(name), exist_ok=True)
+        return name
+
+    def get(self, name):
+        """The loaded collection at its latest version, or None if nothing is indexed in it yet."""
+        folder = self.collection_dir(name)
+        manifest = self._manifest(folder)
+        if not has_index(manifest, folder):
+            return None
+
+        with self._lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None and loaded.version == manifest["version"]:
+                self._loaded.move_to_end(name)
+                return loaded
+
+        vectorstore = load_vectorstore(CustomEmbeddings(), manifest, folder=folder)
+        loaded = LoadedCollection(
+            name, manifest["version"], vectorstore, load_lexical_index(vectorstore, folder),
+            _footprint(folder, manifest),
+        )
+        self._publish(loaded)
+        return loaded
+
+    def ingest(self, name, uploaded_files, on_update=None, on_warning=None, on_progress=None, should_stop=None,
+               checkpoint_seconds=None):
+        """
+        Index `uploaded_files` into collection `name` and publish the new version.
+        The callbacks and checkpointing are passed on to process_documents.
+        Ingestions into one collection run one at a time, across processes too
+        (Streamlit, the API and their replicas share the collection folders).
+        """
+        folder = self.collection_dir(name)
+        os.makedirs(folder, exist_ok=True)
+        with FileLock(os.path.join(folder, INGEST_LOCK_FILE)):
+            version = load_manifest(folder)["version"]
+            with tracing.trace("ingest", collection=name, files=len(uploaded_files or [])):
+                vectorstore, lexical_index, manifest = process_documents(
+                    uploaded_files, on_update=on_update, folder=folder, on_warning=on_warning,
+                    on_progress=on_progress, should_stop=should_stop, checkpoint_seconds=checkpoint_seconds,
+                )
+        # Nothing saved → `vectorstore` is the private writable copy, never to be shared
+        if vectorstore is None or manifest["version"] == version or not has_index(manifest, folder):
+            return self.get(name)
+        loaded = LoadedCollection(name, manifest["version"], vectorstore, lexical_index, _footprint(folder, manifest))
+        self._publish(loaded)
+        return loaded
+
+    def evict(self, name):
+        with self._lock:
+            self._loaded.pop(name, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": {name: c.nbytes for name, c in self._loaded.items()},
+                "bytes": sum(c.nbytes for c in self._loaded.values()),
+                "budget": self.memory_budget,
+            }
+
+    def _manifest(self, folder):
+        """The folder's manifest, parsed again (and legacy indexes migrated) only when the file changed."""
+        path = os.path.join(folder, MANIFEST_FILE)
+        try:
+            stat = os.stat(path)
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = None
+        with self._lock:
+            cached = self._manifests.get(folder)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        manifest = load_manifest(folder)
+        if manifest["files"] and manifest.get("format") != FORMAT_VERSION:
+            # Under the ingest lock: another process may be migrating or ingesting
+            with FileLock(os.path.join(folder, INGEST_LOCK_FILE)):
+                manifest = migrate_legacy_index(load_manifest(folder), folder)
+            if manifest.get("format") == FORMAT_VERSION:
+                key = None  # rewritten by the migration → stat it again next time
+        with self._lock:
+            self._manifests[folder] = (key, manifest)
+        return manifest
+
+    def _publish(self, loaded):
+        with self._lock:
+            self._loaded[loaded.name] = loaded
+            self._loaded.move_to_end(loaded.name)
+            # Always keep the collection just published, even if it alone exceeds the budget
+            while len(self._loaded) > 1 and sum(c.nbytes for c in self._loaded.values()) > self.memory_budget:
+                self._loaded.popitem(last=False)
+
+
+def _footprint(folder, manifest):
+    """Bytes a loaded collection can pin: its mapped index and id arrays."""
+    files = [manifest["index_file"], manifest["ids_file"], manifest["ids_file"].replace(".npy", ".order.npy")]
+    return sum(
+        os.path.getsize(os.path.join(folder, f)) for f in files if os.path.exists(os.path.join(folder, f))
+    )
+
+
+def _migrate_single_index_layout():
+    """Move an index from the pre-collections layout (files directly in vectorstore_data/) into 'default'."""
+    if not os.path.exists(os.path.join(VECTORSTORE_ROOT, MANIFEST_FILE)):
+        return
+    target = os.path.join(COLLECTIONS_DIR, DEFAULT_COLLECTION)
+    if os.path.exists(os.path.join(target, MANIFEST_FILE)):
+        return
+    os.makedirs(target, exist_ok=True)
+    # Manifest last: until it moves, the old layout is still complete
+    patterns = ("index.faiss", "index.pkl", "index-v*.faiss", "ids-v*.npy", "chunks.sqlite*", "bm25.json", "manifest.json")
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(VECTORSTORE_ROOT, pattern)):
+            shutil.move(path, os.path.join(target, os.path.basename(path)))
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_index_manager():
+    """Process-wide index manager shared by all sessions."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _migrate_single_index_layout()
+            _manager = IndexManager()
+        return _manager
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from module.document_processor import VECTORSTORE_ROOT, file_fingerprint
+from module.index_manager import get_index_manager
+from module.utilities import FileLock
+
+# -------------------- SETTINGS --------------------
+JOBS_DIR = os.path.join(VECTORSTORE_ROOT, "jobs")
+CHECKPOINT_SECONDS = float(os.environ.get("DOCUMIND_CHECKPOINT_SECONDS", "30"))
+INGEST_WORKERS = 1   # jobs run one at a time; extraction is parallel inside a job
+MAX_ACTIVE_JOBS = int(os.environ.get("DOCUMIND_MAX_JOBS", "32"))  # queued + running, per process
+JOB_HISTORY = 50     # finished jobs kept for status queries
+JOB_FILE = "job.json"
+CLAIM_FILE = "claim.lock"  # held by the process running the job
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobQueueFull(Exception):
+    """Raised by JobRegistry.submit when MAX_ACTIVE_JOBS jobs are already queued or running."""
+
+
+class StoredUpload:
+    """An upload saved in a job folder, with the interface process_documents expects."""
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    def getbuffer(self):
+        with open(self.path, "rb") as f:
+            return memoryview(f.read())
+
+
+class IngestJob:
+    """State and progress of one background ingestion into a collection."""
+    def __init__(self, job_id, collection, uploads, key=None, created_at=None):
+        self.id = job_id
+        self.collection = collection
+        self.uploads = uploads
+        self.key = key  # (collection, frozenset of (name, hash)) for de-duplication
+        self.status = QUEUED
+        self.error = None
+        self.warnings = []
+        self.files = {u.name: {"status": QUEUED, "pages": 0, "chunks": 0, "duplicates": 0} for u in uploads}
+        self.embedding = {"done": 0, "total": 0, "rate": 0.0}
+        self.chunks_indexed = 0
+        self.checkpoints = 0
+        self.version = None
+        self.created_at = created_at or time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.claim = None  # FileLock on the job folder while this process owns the job
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def cancel(self):
+        """Stop after the current page range; files already indexed are kept."""
+        self._cancel.set()
+
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def on_progress(self, event, file_name, info):
+        with self._lock:
+            if event == "embedding":
+                self.embedding = {"done": info["done"], "total": info["total"], "rate": info["rate"]}
+                self.chunks_indexed = info["indexed"]
+            elif event == "checkpoint":
+                self.checkpoints += 1
+                self.version = info["version"]
+            elif event == "pages":
+                entry = self.files[file_name]
+                entry["status"] = RUNNING
+                entry["pages"] += info["pages"]
+                entry["chunks"] += info["chunks"]
+                entry["duplicates"] += info["duplicates"]
+            elif event == "failed":
+                self.files[file_name].update(status=FAILED, error=info["error"])
+            elif event in ("indexed", "unchanged"):
+                self.files[file_name].update(status=DONE if event == "indexed" else event, chunks=info["chunks"])
+
+    def snapshot(self):
+        """JSON-serializable copy of the job state."""
+        with self._lock:
+            files = {name: dict(entry) for name, entry in self.files.items()}
+            finished = sum(1 for entry in files.values() if entry["status"] not in (QUEUED, RUNNING))
+            return {
+                "id": self.id,
+                "collection": self.collection,
+                "status": self.status,
+                "error": self.error,
+                "warnings": list(self.warnings),
+                "files": files,
+                "files_total": len(files),
+                "files_finished": finished,
+                "chunks": sum(entry["chunks"] for entry in files.values()),
+                "duplicates": sum(entry["duplicates"] for entry in files.values()),
+                "embedding": dict(self.embedding),
+                "checkpoints": self.checkpoints,
+                "version": self.version,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobRegistry:
+    """
+    Runs ingestion jobs on a background thread so the UI stays responsive.
+
+    Uploads are copied into a per-job folder under `jobs_dir` together with a small
+    journal, and the folder is removed when the job ends. Jobs still queued or
+    running when the process stopped are resumed by `resume()`: files finished
+    before the last checkpoint are skipped by their content hash, the rest are
+    indexed again. Submitting the same files to the same collection while a job
+    for them is active returns that job instead of starting another one; any
+    other submission beyond `max_jobs` active jobs raises JobQueueFull.
+
+    Several processes (Streamlit, the API, replicas) may share `jobs_dir`: the
+    process running a job holds a lock on its folder, so a job is only resumed
+    by one process, and only once the process that owned it has stopped.
+    """
+    def __init__(self, manager=None, jobs_dir=JOBS_DIR, checkpoint_seconds=CHECKPOINT_SECONDS,
+                 max_jobs=MAX_ACTIVE_JOBS):
+        self.manager = manager or get_index_manager()
+        self.jobs_dir = jobs_dir
+        self.checkpoint_seconds = checkpoint_seconds
+        self.max_jobs = max_jobs
+        self._reserved = 0  # submissions past the limit check whose job isn't registered yet
+        self._jobs = OrderedDict()  # id -> IngestJob, oldest first
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def submit(self, collection, uploaded_files):
+        """Queue `uploaded_files` for ingestion into `collection`; returns the IngestJob."""
+        self.manager.collection_dir(collection)  # validates the name
+        contents = [(u.name, bytes(u.getbuffer())) for u in uploaded_files]
+        key = (collection, frozenset((name, file_fingerprint(data)) for name, data in contents))
+
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active and job.key == key:
+                    return job
+            active = sum(1 for job in self._jobs.values() if job.active) + self._reserved
+            if active >= self.max_jobs:
+                raise JobQueueFull(f"{active} ingestion jobs are already queued or running.")
+            self._reserved += 1
+
+        try:
+            job_id = uuid.uuid4().hex[:12]
+            files_dir = os.path.join(self.jobs_dir, job_id, "files")
+            os.makedirs(files_dir)
+            # Claimed before the journal exists, so no other process can resume it
+            claim = FileLock(os.path.join(self.jobs_dir, job_id, CLAIM_FILE))
+            claim.acquire()
+            uploads = []
+            for name, data in contents:
+                path = os.path.join(files_dir, os.path.basename(name))
+                with open(path, "wb") as f:
+                    f.write(data)
+                uploads.append(StoredUpload(name, path))
+
+            job = IngestJob(job_id, collection, uploads, key=key)
+            job.claim = claim
+            self._journal(job)
+            self._enqueue(job)
+        finally:
+            with self._lock:
+                self._reserved -= 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, collection=None):
+        """Jobs, newest first, optionally only those of one collection."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job for job in reversed(jobs) if collection is None or job.collection == collection]
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel()
+        return True
+
+    def resume(self):
+        """Re-queue the jobs a stopped process left unfinished; returns them."""
+        resumed = []
+        for job_id in sorted(os.listdir(self.jobs_dir)):
+            path = os.path.join(self.jobs_dir, job_id, JOB_FILE)
+            if not os.path.exists(path) or self.get(job_id) is not None:
+                continue
+            claim = FileLock(os.path.join(self.jobs_dir, job_id, CLAIM_FILE))
+            try:
+                claimed = claim.acquire(blocking=False)
+            except FileNotFoundError:  # finished and removed meanwhile
+                continue
+            if not claimed:
+                continue  # still owned by a running process
+            if not os.path.exists(path):
+                claim.release()
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                journal = json.load(f)
+            files_dir = os.path.join(self.jobs_dir, job_id, "files")
+            uploads = [
+                StoredUpload(name, os.path.join(files_dir, os.path.basename(name)))
+                for name in journal["files"] if os.path.exists(os.path.join(files_dir, os.path.basename(name)))
+            ]
+            job = IngestJob(job_id, journal["collection"], uploads, created_at=journal["created_at"])
+            job.claim = claim
+            self._enqueue(job)
+            resumed.append(job)
+        return resumed
+
+    def _enqueue(self, job):
+        with self._lock:
+            self._jobs[job.id] = job
+            finished = [j for j in self._jobs.values() if not j.active]
+            for old in finished[:max(0, len(finished) - JOB_HISTORY)]:
+                del self._jobs[old.id]
+        self._executor.submit(self._run, job)
+
+    def _journal(self, job):
+        path = os.path.join(self.jobs_dir, job.id, JOB_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"collection": job.collection, "files": [u.name for u in job.uploads],
+                       "created_at": job.created_at}, f)
+        os.replace(path + ".tmp", path)
+
+    def _run(self, job):
+        try:
+            if job.cancel_requested():
+                job.status = CANCELLED
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+            loaded = self.manager.ingest(
+                job.collection, job.uploads,
+                on_warning=job.warnings.append,
+                on_progress=job.on_progress,
+                should_stop=job.cancel_requested,
+                checkpoint_seconds=self.checkpoint_seconds,
+            )
+            job.version = loaded.version if loaded is not None else job.version
+            job.status = CANCELLED if job.cancel_requested() else DONE
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            job.uploads = []
+            shutil.rmtree(os.path.join(self.jobs_dir, job.id), ignore_errors=True)
+            if job.claim is not None:
+                job.claim.release()  # only after the folder is gone, so nobody resumes a finished job
+            job._finished.set()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_job_registry():
+    """Process-wide JobRegistry; resumes unfinished jobs the first time it is created."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = JobRegistry()
+            _registry.resume()
+        return _registry
@@ -0,0 +1,139 @@
+import json
+import math
+import re
+from collections import Counter
+
+# -------------------- SETTINGS --------------------
+BM25_K1 = 1.5
+BM25_B = 0.75
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+SQL_BATCH = 500  # ids per IN (...) query, below SQLite's bound-parameter limit
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS bm25_postings (term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+    "PRIMARY KEY (term, doc_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS bm25_postings_doc ON bm25_postings (doc_id)",
+    "CREATE TABLE IF NOT EXISTS bm25_docs (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS bm25_stats (id INTEGER PRIMARY KEY CHECK (id = 0), docs INTEGER NOT NULL, "
+    "total_length INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO bm25_stats (id, docs, total_length) VALUES (0, 0, 0)",
+)
+
+
+def tokenize(text):
+    """
+    Lowercased word tokens. Compound identifiers such as part numbers or error
+    codes ("E-1042", "v2.3.1") are kept whole and also indexed by their parts.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in re.split(r"[-./]", match) if part)
+    return tokens
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), SQL_BATCH):
+        yield items[start:start + SQL_BATCH]
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring over the same chunks as the FAISS store,
+    keyed by docstore id. The postings live in the collection's chunk store
+    (SQLite), so opening the index loads nothing and a query reads only the
+    postings of its terms. Writes share the docstore's transaction and become
+    visible to readers when the index version is saved.
+    """
+    def __init__(self, docstore):
+        self.docstore = docstore
+        if not docstore.read_only:
+            for statement in SCHEMA:
+                docstore.execute(statement)
+
+    def __len__(self):
+        return self._stats()[0]
+
+    def _stats(self):
+        return self.docstore.execute("SELECT docs, total_length FROM bm25_stats WHERE id = 0")[0]
+
+    def add(self, ids, texts):
+        ids = list(ids)
+        self.delete(ids)
+        postings, docs = [], {}
+        for doc_id, text in zip(ids, texts):
+            counts = Counter(tokenize(text))
+            postings.extend((term, doc_id, tf) for term, tf in counts.items())
+            docs[doc_id] = sum(counts.values())
+        self.docstore.executemany("INSERT INTO bm25_postings (term, doc_id, tf) VALUES (?, ?, ?)", postings)
+        self.docstore.executemany("INSERT INTO bm25_docs (doc_id, length) VALUES (?, ?)", docs.items())
+        self.docstore.execute(
+            "UPDATE bm25_stats SET docs = docs + ?, total_length = total_length + ? WHERE id = 0",
+            (len(docs), sum(docs.values())),
+        )
+
+    def delete(self, ids):
+        for batch in _batches(set(ids)):
+            marks = ",".join("?" * len(batch))
+            rows = self.docstore.execute(f"SELECT doc_id, length FROM bm25_docs WHERE doc_id IN ({marks})", batch)
+            if not rows:
+                continue
+            found = [(doc_id,) for doc_id, _ in rows]
+            self.docstore.executemany("DELETE FROM bm25_postings WHERE doc_id = ?", found)
+            self.docstore.executemany("DELETE FROM bm25_docs WHERE doc_id = ?", found)
+            self.docstore.execute(
+                "UPDATE bm25_stats SET docs = docs - ?, total_length = total_length - ? WHERE id = 0",
+                (len(rows), sum(length for _, length in rows)),
+            )
+
+    def clear(self):
+        for table in ("bm25_postings", "bm25_docs"):
+            self.docstore.execute(f"DELETE FROM {table}")
+        self.docstore.execute("UPDATE bm25_stats SET docs = 0, total_length = 0 WHERE id = 0")
+
+    def search(self, query, k):
+        """Top-k (doc id, BM25 score) pairs for `query`."""
+        n, total_length = self._stats()
+        terms = list(set(tokenize(query)))
+        if n == 0 or not terms:
+            return []
+        avg_length = total_length / n
+        postings = {}
+        for batch in _batches(terms):
+            rows = self.docstore.execute(
+                "SELECT p.term, p.doc_id, p.tf, d.length FROM bm25_postings p JOIN bm25_docs d USING (doc_id) "
+                f"WHERE p.term IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            for term, doc_id, tf, length in rows:
+                postings.setdefault(term, []).append((doc_id, tf, length))
+        scores = Counter()
+        for posting in postings.values():
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf, length in posting:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores.most_common(k)
+
+    def load_json(self, path):
+        """Import postings saved as JSON by earlier versions (bm25.json)."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.clear()
+        self.docstore.executemany(
+            "INSERT INTO bm25_postings (term, doc_id, tf) VALUES (?, ?, ?)",
+            ((term, doc_id, tf) for term, posting in data["postings"].items() for doc_id, tf in posting.items()),
+        )
+        self.docstore.executemany("INSERT INTO bm25_docs (doc_id, length) VALUES (?, ?)", data["doc_lengths"].items())
+        self.docstore.execute(
+            "UPDATE bm25_stats SET docs = ?, total_length = ? WHERE id = 0",
+            (len(data["doc_lengths"]), sum(data["doc_lengths"].values())),
+        )
+
+    def rebuild(self, ids):
+        """Index the chunks `ids` from the docstore, replacing any postings."""
+        self.clear()
+        for batch in _batches(ids):
+            self.add(batch, [self.docstore.search(doc_id).page_content for doc_id in batch])
@@ -0,0 +1,164 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from module import tracing
+from module.resources import get_llm
+from module.scheduler import get_scheduler
+from module.context_builder import count_tokens, normalize_whitespace, truncate_tokens
+
+# -------------------- SETTINGS --------------------
+MEMORY_TURNS = int(os.environ.get("DOCUMIND_MEMORY_TURNS", "3"))        # recent turns kept verbatim
+MEMORY_TOKEN_BUDGET = int(os.environ.get("DOCUMIND_MEMORY_TOKENS", "400"))  # summary + recent turns in the prompt
+SUMMARY_TOKENS = 150
+TURN_TOKENS = 120        # per question or answer quoted from a recent turn
+MAX_SESSIONS = 256       # memories kept for API clients, least recently used dropped
+
+# Queries that refer back to the conversation and need rewriting before retrieval:
+# explicit references and continuations always, bare pronouns only in short queries
+# ("what does it cost?"), very short queries always
+_REFERENCE = re.compile(
+    r"\b(former|latter|aforementioned|earlier|you (said|mentioned|mention|described|listed)|your (last |previous )?answer|"
+    r"(that|this|the other|the same|the previous|the last) ones?)\b"
+    r"|^(and|but|also|then|what about|how about|what else|why not)\b",
+    re.IGNORECASE,
+)
+_PRONOUN = re.compile(r"\b(it|its|this|that|these|those|they|them|their|he|she|him|her|his)\b", re.IGNORECASE)
+SHORT_QUERY_WORDS = 3
+PRONOUN_QUERY_WORDS = 6
+
+REWRITE_PROMPT = """Rewrite the follow-up question as one standalone question that can be understood without the conversation. Keep names, numbers and terms from the conversation it refers to. Reply with the question only.
+
+{conversation}
+
+Follow-up question: {query}
+
+Standalone question:"""
+
+SUMMARY_PROMPT = """Update the summary of a conversation about some documents with the new exchanges. Keep the topics, names, numbers and conclusions a later question could refer to, in at most {words} words. Reply with the summary only.
+
+Summary so far:
+{summary}
+
+New exchanges:
+{turns}
+
+Updated summary:"""
+
+
+def _format_turns(turns, budget=TURN_TOKENS):
+    return "\n".join(
+        f"User: {truncate_tokens(normalize_whitespace(turn['user']), budget)}\n"
+        f"Assistant: {truncate_tokens(normalize_whitespace(turn['bot']), budget)}"
+        for turn in turns
+    )
+
+
+def _generate(prompt, session_id):
+    llm = get_llm("llama3.2", temperature=0)
+    with get_scheduler().generation.slot(session=session_id):
+        return llm.invoke(prompt).strip()
+
+
+class ConversationMemory:
+    """
+    Bounded memory of one chat: the last turns verbatim plus a running summary of
+    everything older.
+
+    Turns leaving the window are folded into the summary MEMORY_TURNS at a time, so
+    summarizing costs one LLM call every few turns and each turn is summarized only
+    once. `context()` stays within MEMORY_TOKEN_BUDGET however long the chat gets.
+    The chat itself is owned by the caller (`chat_history` in the session state) and
+    passed to every method as a list of {"user": ..., "bot": ...} turns.
+    """
+    def __init__(self, turns=MEMORY_TURNS, budget=MEMORY_TOKEN_BUDGET):
+        self.turns = turns
+        self.budget = budget
+        self.summary = ""
+        self.summarized = 0   # leading turns of the history folded into the summary
+        self._lock = threading.Lock()
+
+    def update(self, history, session_id=None):
+        """Fold turns that left the window into the summary."""
+        with self._lock:
+            if len(history) < self.summarized:   # the chat was reset
+                self.summary, self.summarized = "", 0
+            end = len(history) - self.turns
+            if end - self.summarized < self.turns:
+                return
+            # At most `turns` turns per call, so the prompt stays the same size: a memory
+            # that starts late (a new API session with a long history) skips the oldest
+            start = max(self.summarized, end - self.turns)
+            with tracing.span("summarize_memory"):
+                summary = _generate(SUMMARY_PROMPT.format(
+                    words=SUMMARY_TOKENS * 3 // 4, summary=self.summary or "(none)",
+                    turns=_format_turns(history[start:end]),
+                ), session_id)
+            self.summary = truncate_tokens(normalize_whitespace(summary), SUMMARY_TOKENS)
+            self.summarized = end
+
+    def context(self, history):
+        """Summary and the most recent turns that fit the token budget, oldest first."""
+        with self._lock:
+            summary = f"Summary of earlier conversation: {self.summary}" if self.summary else ""
+            summarized = self.summarized
+        budget = self.budget - count_tokens(summary)
+        recent = []
+        for turn in reversed(history[summarized:]):
+            text = _format_turns([turn])
+            cost = count_tokens(text) + 1
+            if cost > budget:
+                break
+            recent.insert(0, text)
+            budget -= cost
+        return "\n".join(part for part in [summary, *recent] if part)
+
+    def standalone_query(self, query, history, session_id=None):
+        """`query` rewritten to not depend on the conversation; unchanged when it doesn't."""
+        if not history or not is_follow_up(query):
+            return query
+        with tracing.span("rewrite_query"):
+            rewritten = _generate(
+                REWRITE_PROMPT.format(conversation=self.context(history), query=query), session_id
+            )
+        rewritten = rewritten.splitlines()[0].strip().strip("\"'") if rewritten else ""
+        # A rewrite that rambles is worse than the original question
+        if not rewritten or count_tokens(rewritten) > 3 * count_tokens(query) + 40:
+            return query
+        return rewritten
+
+
+def is_follow_up(query):
+    """Whether `query` likely depends on earlier turns (cheap heuristic, no LLM call)."""
+    words = len(query.split())
+    return (
+        words <= SHORT_QUERY_WORDS
+        or bool(_REFERENCE.search(query.strip()))
+        or (words <= PRONOUN_QUERY_WORDS and bool(_PRONOUN.search(query)))
+    )
+
+
+_memories = OrderedDict()
+_memories_lock = threading.Lock()
+
+
+def get_memory(session_state):
+    """
+    ConversationMemory of a chat: `session_state["memory"]` when set (Streamlit
+    sessions), else the one kept for `session_state["session_id"]` (API clients),
+    else a new one.
+    """
+    memory = session_state.get("memory")
+    if memory is not None:
+        return memory
+    session_id = session_state.get("session_id")
+    if session_id is None:
+        return ConversationMemory()
+    with _memories_lock:
+        memory = _memories.get(session_id)
+        if memory is None:
+            memory = _memories[session_id] = ConversationMemory()
+            while len(_memories) > MAX_SESSIONS:
+                _memories.popitem(last=False)
+        _memories.move_to_end(session_id)
+        return memory
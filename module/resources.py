@@ -0,0 +1,43 @@
+import threading
+from langchain_ollama import OllamaEmbeddings, OllamaLLM
+
+# Process-wide registry of model clients.
+# Streamlit imports this module once per server process, so everything here is
+# shared by all browser sessions instead of being rebuilt per session or per call.
+# Loaded indexes are shared through module.index_manager.
+
+_lock = threading.Lock()
+_llms = {}          # (model, temperature) -> OllamaLLM
+_embedders = {}     # model -> OllamaEmbeddings
+_backend = {"llm": OllamaLLM, "embeddings": OllamaEmbeddings}
+
+
+def use_backend(llm_class=OllamaLLM, embeddings_class=OllamaEmbeddings):
+    """
+    Swap the classes model clients are built from (e.g. the offline stand-in in
+    benchmarks/fake_backend.py) and drop the clients built so far. Both classes
+    are constructed like their Ollama counterparts: `(model=..., temperature=...)`
+    and `(model=...)`.
+    """
+    with _lock:
+        _backend["llm"] = llm_class
+        _backend["embeddings"] = embeddings_class
+        _llms.clear()
+        _embedders.clear()
+
+
+def get_llm(model="llama3.2", temperature=0.3):
+    """Shared OllamaLLM; each instance keeps one pooled HTTP client for its model."""
+    key = (model, temperature)
+    with _lock:
+        if key not in _llms:
+            _llms[key] = _backend["llm"](model=model, temperature=temperature)
+        return _llms[key]
+
+
+def get_embedder(model="nomic-embed-text"):
+    """Shared OllamaEmbeddings client for `model`."""
+    with _lock:
+        if model not in _embedders:
+            _embedders[model] = _backend["embeddings"](model=model)
+        return _embedders[model]
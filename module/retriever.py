@@ -1,19 +1,184 @@
-from langchain_community.vectorstores import FAISS
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import LLMChainExtractor
-from langchain_community.llms import Ollama
+import os
+import time
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+from module import tracing
+from module.resources import get_llm
+from module.scheduler import get_scheduler
 
+logger = logging.getLogger(__name__)
 
-def get_retriever(vectorstore):
+# -------------------- RETRIEVAL MODES --------------------
+# similarity        → top-k FAISS hits, no extra work
+# embeddings_filter → drop hits whose cosine similarity to the query is below the
+#                     threshold, using the vectors already stored in the index (no LLM)
+# llm_extract       → LLMChainExtractor on every hit, run concurrently across the k chunks
+RETRIEVAL_MODES = ("similarity", "embeddings_filter", "llm_extract")
+DEFAULT_RETRIEVAL_MODE = os.environ.get("DOCUMIND_RETRIEVAL_MODE", "llm_extract")
+TOP_K = 5
+SIMILARITY_THRESHOLD = 0.5
+
+# -------------------- HYBRID SEARCH --------------------
+# With a lexical index, dense (FAISS) and sparse (BM25) searches run in parallel
+# and their rankings are merged with reciprocal rank fusion.
+RRF_K = 60
+CANDIDATES_PER_SEARCH = 4 * TOP_K
+_search_pool = ThreadPoolExecutor(max_workers=8)
+
+
+class DocumentRetriever:
     """
-    Returns a retriever with semantic re-ranking (contextual compression)
-    so only the most relevant chunks are passed to the LLM.
+    Retriever over a FAISS vectorstore with a selectable post-processing mode.
+
+    Every returned document carries its cosine similarity to the query in
+    `metadata["score"]`. Per-stage latencies of the last call are kept in
+    `last_timings` (milliseconds) and logged. `collection` and `index_version`
+    identify the index contents for caches keyed on them. Passing a BM25 `lexical_index` built
+    over the same chunks turns on hybrid dense + sparse search.
     """
-    base_retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
-    llm = Ollama(model="llama3.2", temperature=0)
-    compressor = LLMChainExtractor.from_llm(llm)
+    def __init__(self, vectorstore, mode=DEFAULT_RETRIEVAL_MODE, k=TOP_K,
+                 similarity_threshold=SIMILARITY_THRESHOLD, index_version=None, lexical_index=None,
+                 collection=None):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        self.vectorstore = vectorstore
+        self.mode = mode
+        self.k = k
+        self.similarity_threshold = similarity_threshold
+        self.index_version = index_version
+        self.collection = collection
+        self.lexical_index = lexical_index
+        self.last_timings = {}
+        self._positions = None
+        self._compressor = None
+        if mode == "llm_extract":
+            # Imported here: the LangChain chains stack is only needed by this mode
+            from langchain.retrievers.document_compressors import LLMChainExtractor
+            self._compressor = LLMChainExtractor.from_llm(get_llm("llama3.2", temperature=0))
+
+    def get_relevant_documents(self, query):
+        timings = {}
+        start = time.perf_counter()
+
+        if self.lexical_index is None:
+            query_vector, positions = self._dense_search(query, self.k, timings)
+        else:
+            query_vector, positions = self._hybrid_search(query, timings)
+
+        step = time.perf_counter()
+        hits = [hit for hit in (self._hit(position, query_vector) for position in positions) if hit]
+        if self.mode == "embeddings_filter":
+            hits = [(doc, score) for doc, score in hits if score >= self.similarity_threshold]
+        docs = []
+        for doc, score in hits:
+            doc.metadata["score"] = score
+            docs.append(doc)
+        if self.mode == "llm_extract":
+            docs = self._extract(query, docs)
+        timings["postprocess_ms"] = (time.perf_counter() - step) * 1000
+
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        self.last_timings = timings
+        for stage, ms in timings.items():
+            tracing.record("retrieve" if stage == "total_ms" else f"retrieve.{stage[:-3]}", ms)
+        logger.info("retrieval mode=%s %s", self.mode, {k: round(v, 1) for k, v in timings.items()})
+        return docs
+
+    invoke = get_relevant_documents
+
+    def _dense_search(self, query, n, timings):
+        """Embed the query and return (query vector, top-n FAISS positions)."""
+        start = time.perf_counter()
+        query_vector = np.asarray(self.vectorstore.embeddings.embed_query(query), dtype=np.float32)
+        timings["embed_ms"] = (time.perf_counter() - start) * 1000
+
+        step = time.perf_counter()
+        index = self.vectorstore.index
+        positions = []
+        if index.ntotal:
+            _, found = index.search(query_vector.reshape(1, -1), min(n, index.ntotal))
+            positions = [int(p) for p in found[0] if p != -1]
+        timings["search_ms"] = (time.perf_counter() - step) * 1000
+        return query_vector, positions
+
+    def _lexical_search(self, query, n, timings):
+        start = time.perf_counter()
+        ids = [doc_id for doc_id, _ in self.lexical_index.search(query, n)]
+        timings["lexical_ms"] = (time.perf_counter() - start) * 1000
+        return ids
 
-    return ContextualCompressionRetriever(
-        base_retriever=base_retriever,
-        base_compressor=compressor
+    def _hybrid_search(self, query, timings):
+        """Dense and BM25 search in parallel, fused by reciprocal rank."""
+        dense = _search_pool.submit(self._dense_search, query, CANDIDATES_PER_SEARCH, timings)
+        lexical = _search_pool.submit(self._lexical_search, query, CANDIDATES_PER_SEARCH, timings)
+        query_vector, dense_positions = dense.result()
+        lexical_ids = lexical.result()
+
+        step = time.perf_counter()
+        fused = {}
+        for rank, position in enumerate(dense_positions):
+            fused[position] = fused.get(position, 0.0) + 1 / (RRF_K + rank + 1)
+        for rank, doc_id in enumerate(lexical_ids):
+            position = self._position_of(doc_id)
+            if position is not None:
+                fused[position] = fused.get(position, 0.0) + 1 / (RRF_K + rank + 1)
+        positions = sorted(fused, key=fused.get, reverse=True)[:self.k]
+        timings["fusion_ms"] = (time.perf_counter() - step) * 1000
+        return query_vector, positions
+
+    def _position_of(self, doc_id):
+        mapping = self.vectorstore.index_to_docstore_id
+        # Memory-mapped stores look ids up on disk; in-memory ones get a reverse dict
+        if hasattr(mapping, "position_of"):
+            return mapping.position_of(doc_id)
+        if self._positions is None:
+            self._positions = {i: p for p, i in mapping.items()}
+        return self._positions.get(doc_id)
+
+    def _hit(self, position, query_vector):
+        """(document copy, cosine similarity to the query) for a FAISS position, None if gone."""
+        doc = self.vectorstore.docstore.search(self.vectorstore.index_to_docstore_id[position])
+        if not isinstance(doc, Document):
+            # Deleted by an ingestion that published a newer index version
+            return None
+        vector = self.vectorstore.index.reconstruct(position)
+        norms = (np.linalg.norm(vector) or 1.0) * (np.linalg.norm(query_vector) or 1.0)
+        return doc.model_copy(deep=True), float(np.dot(vector, query_vector) / norms)
+
+    def _extract(self, query, docs):
+        if not docs:
+            return docs
+        with ThreadPoolExecutor(max_workers=len(docs)) as pool:
+            extracted = pool.map(lambda doc: self._extract_one(query, doc), docs)
+        return [doc for result in extracted for doc in result]
+
+    def _extract_one(self, query, doc):
+        with get_scheduler().generation.slot():
+            return self._compressor.compress_documents([doc], query)
+
+
+def get_retriever(vectorstore, mode=DEFAULT_RETRIEVAL_MODE, index_version=None, lexical_index=None,
+                  collection=None):
+    """
+    Returns a retriever for the given mode. The default mode keeps the semantic
+    re-ranking (contextual compression), now run concurrently across the k chunks.
+    """
+    return DocumentRetriever(
+        vectorstore, mode=mode, index_version=index_version, lexical_index=lexical_index, collection=collection
     )
+
+
+def compare_modes(vectorstore, queries, modes=RETRIEVAL_MODES):
+    """Average per-stage latency (ms) of each retrieval mode over `queries`."""
+    report = {}
+    for mode in modes:
+        retriever = DocumentRetriever(vectorstore, mode=mode)
+        totals = {}
+        for query in queries:
+            retriever.get_relevant_documents(query)
+            for stage, ms in retriever.last_timings.items():
+                totals[stage] = totals.get(stage, 0.0) + ms
+        report[mode] = {stage: ms / max(len(queries), 1) for stage, ms in totals.items()}
+    return report
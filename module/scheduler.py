@@ -0,0 +1,197 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+# Central scheduling of calls to the Ollama server.
+# Every embedding and generation request takes a slot from a PriorityGate, so the
+# model server sees a bounded number of concurrent calls no matter how many
+# sessions are active. Concurrent query embeddings are coalesced into one batch.
+
+# -------------------- SETTINGS --------------------
+INTERACTIVE = 0  # user-facing queries: query embeddings, extraction, answers
+BULK = 1         # document ingestion
+
+GENERATION_SLOTS = int(os.environ.get("DOCUMIND_GENERATION_SLOTS", "4"))
+EMBEDDING_SLOTS = int(os.environ.get("DOCUMIND_EMBEDDING_SLOTS", "5"))
+QUERY_BATCH_WINDOW = 0.005  # seconds a query embedding waits for others to join its batch
+QUERY_BATCH_MAX = 32
+WAIT_SAMPLES = 1000          # recent wait times kept per gate for the metrics
+
+
+class PriorityGate:
+    """
+    Admits at most `limit` concurrent calls. Waiting callers are served by priority
+    (INTERACTIVE before BULK) and, within a priority, fairly across sessions using
+    virtual-time fair queueing: a session that already queued several calls gets
+    later tags than one asking for the first time. BULK calls never take the last
+    free slot, so an interactive query does not wait behind a whole ingestion run.
+    """
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = max(1, limit)
+        self.bulk_limit = max(1, self.limit - 1)
+        self.running = 0
+        self.running_bulk = 0
+        self.served = 0
+        self._vtime = 0
+        self._session_tags = {}  # session -> tag of its last queued call
+        self._queue = []         # heap of (priority, tag, seq)
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, session=None, priority=INTERACTIVE):
+        """Hold one slot for the duration of the `with` block."""
+        start = time.perf_counter()
+        with self._cond:
+            tag = max(self._vtime, self._session_tags.get(session, 0)) + 1
+            if session is not None:
+                self._session_tags[session] = tag
+            ticket = (priority, tag, next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            while self._queue[0] != ticket or not self._can_run(priority):
+                self._cond.wait()
+            heapq.heappop(self._queue)
+            self.running += 1
+            if priority == BULK:
+                self.running_bulk += 1
+            self._vtime = max(self._vtime, tag)
+            self._waits.append(time.perf_counter() - start)
+            # Tags at or below the virtual clock carry no history any more
+            for s in [s for s, t in self._session_tags.items() if t <= self._vtime]:
+                del self._session_tags[s]
+            self._cond.notify_all()  # the next ticket may be runnable too
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.running -= 1
+                if priority == BULK:
+                    self.running_bulk -= 1
+                self.served += 1
+                self._cond.notify_all()
+
+    def _can_run(self, priority):
+        if self.running >= self.limit:
+            return False
+        return priority != BULK or self.running_bulk < self.bulk_limit
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                "limit": self.limit,
+                "running": self.running,
+                "queued": len(self._queue),
+                "served": self.served,
+                "wait_ms_avg": 1000 * sum(waits) / len(waits) if waits else 0.0,
+                "wait_ms_p95": 1000 * waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            }
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent single-text embeddings into batched calls.
+
+    The first caller of a window waits `window` seconds, then embeds everything
+    queued meanwhile with one `embed_fn(texts)` call per distinct `embed_fn` (in
+    chunks of `max_batch`) and hands every caller its own vector. Each caller
+    passes its own `embed_fn`, which takes its own gate slot; callers passing
+    equal functions (e.g. the same bound method) share batches.
+    """
+    def __init__(self, window=QUERY_BATCH_WINDOW, max_batch=QUERY_BATCH_MAX):
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.texts = 0
+        self._pending = []  # (text, embed_fn, Future)
+        self._collecting = False
+        self._lock = threading.Lock()
+
+    def embed(self, text, embed_fn):
+        future = Future()
+        with self._lock:
+            self._pending.append((text, embed_fn, future))
+            leader = not self._collecting
+            self._collecting = True
+
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                pending, self._pending = self._pending, []
+                self._collecting = False
+            groups = {}
+            for text, embed_fn, waiting in pending:
+                groups.setdefault(embed_fn, []).append((text, waiting))
+            for embed_fn, group in groups.items():
+                for i in range(0, len(group), self.max_batch):
+                    self._run(embed_fn, group[i:i + self.max_batch])
+
+        return future.result()
+
+    def _run(self, embed_fn, batch):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            by_text = dict(zip(texts, embed_fn(texts)))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.texts += len(batch)
+        for text, future in batch:
+            future.set_result(by_text[text])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "queries": self.texts,
+                "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            }
+
+
+class Scheduler:
+    """The process-wide gates plus one query batcher per embedding model."""
+    def __init__(self, generation_slots=GENERATION_SLOTS, embedding_slots=EMBEDDING_SLOTS):
+        self.generation = PriorityGate("generation", generation_slots)
+        self.embedding = PriorityGate("embedding", embedding_slots)
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def query_batcher(self, model):
+        """Shared QueryBatcher for `model`."""
+        with self._lock:
+            if model not in self._batchers:
+                self._batchers[model] = QueryBatcher()
+            return self._batchers[model]
+
+    def stats(self):
+        with self._lock:
+            batchers = dict(self._batchers)
+        return {
+            "generation": self.generation.stats(),
+            "embedding": self.embedding.stats(),
+            "query_batching": {model: b.stats() for model, b in batchers.items()},
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide Scheduler shared by all sessions."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+        return _scheduler
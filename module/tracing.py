@@ -0,0 +1,224 @@
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Lightweight in-process tracing.
+# A trace is one request (an answer, a retrieval, an ingestion run) made of named
+# spans; spans with the same name may repeat and may nest (e.g. `embed` runs inside
+# `index_write`), so stage totals are sums, not a partition of the wall time.
+# Finished traces go to a ring buffer; span durations and counters are also kept as
+# process-wide aggregates for the JSON and Prometheus-text exports.
+
+# -------------------- SETTINGS --------------------
+TRACE_HISTORY = int(os.environ.get("DOCUMIND_TRACE_HISTORY", "200"))
+METRIC_PREFIX = "documind"
+
+_current = contextvars.ContextVar("documind_trace", default=None)
+_lock = threading.Lock()
+_traces = deque(maxlen=TRACE_HISTORY)
+_stage_totals = {}   # (kind, stage) -> [count, seconds]
+_counters = {}       # (name, kind) -> value
+_trace_totals = {}   # (kind, status) -> [count, seconds]
+
+
+class Trace:
+    """Spans and attributes of one request; thread-safe to record into."""
+    def __init__(self, kind, **attrs):
+        self.kind = kind
+        self.attrs = attrs
+        self.spans = []  # (name, start offset ms, duration ms)
+        self.status = "ok"
+        self.started_at = time.time()
+        self.duration_ms = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        """Time the `with` block as span `name` of this trace."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, (time.perf_counter() - start) * 1000, start)
+
+    def add_span(self, name, duration_ms, start=None):
+        """Record an already measured span; `start` is a perf_counter() value."""
+        start = start if start is not None else time.perf_counter() - duration_ms / 1000
+        with self._lock:
+            self.spans.append((name, (start - self._start) * 1000, duration_ms))
+        _observe(self.kind, name, duration_ms)
+
+    @contextmanager
+    def activate(self):
+        """Make this the current trace for module-level span()/record()/count() calls."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def finish(self, status=None):
+        """Close the trace and publish it; later calls are no-ops."""
+        if self.duration_ms is not None:
+            return
+        self.status = status or self.status
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        with _lock:
+            _traces.append(self)
+            totals = _trace_totals.setdefault((self.kind, self.status), [0, 0.0])
+            totals[0] += 1
+            totals[1] += self.duration_ms / 1000
+
+    def stage_totals(self):
+        """Summed duration (ms) per span name, in first-seen order."""
+        totals = {}
+        with self._lock:
+            for name, _, duration_ms in self.spans:
+                totals[name] = totals.get(name, 0.0) + duration_ms
+        return totals
+
+    def to_dict(self):
+        with self._lock:
+            spans = [{"name": n, "start_ms": round(s, 2), "duration_ms": round(d, 2)} for n, s, d in self.spans]
+        return {
+            "kind": self.kind,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 2) if self.duration_ms is not None else None,
+            "attrs": self.attrs,
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stage_totals().items()},
+            "spans": spans,
+        }
+
+
+def _observe(kind, stage, duration_ms):
+    with _lock:
+        totals = _stage_totals.setdefault((kind, stage), [0, 0.0])
+        totals[0] += 1
+        totals[1] += duration_ms / 1000
+
+
+# -------------------- RECORDING --------------------
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def trace(kind, **attrs):
+    """Run the `with` block as a new current trace; exceptions mark it as failed."""
+    t = Trace(kind, **attrs)
+    try:
+        with t.activate():
+            yield t
+    except BaseException:
+        t.status = "error"
+        raise
+    finally:
+        t.finish()
+
+
+@contextmanager
+def span(name):
+    """Time the `with` block as a span of the current trace (or only the aggregates)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000, start)
+
+
+def record(name, duration_ms, start=None):
+    """Record an already measured span on the current trace (or only the aggregates)."""
+    t = _current.get()
+    if t is not None:
+        t.add_span(name, duration_ms, start)
+    else:
+        _observe("none", name, duration_ms)
+
+
+def traced_iter(iterable, name):
+    """Yield from `iterable`, recording the time spent waiting for each item as span `name`."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            record(name, (time.perf_counter() - start) * 1000, start)
+        yield item
+
+
+def count(name, value=1):
+    """Increment counter `name`, labelled with the current trace kind."""
+    t = _current.get()
+    kind = t.kind if t is not None else "none"
+    with _lock:
+        _counters[(name, kind)] = _counters.get((name, kind), 0) + value
+
+
+# -------------------- EXPORT --------------------
+def recent_traces(n=20, kind=None):
+    """The last `n` finished traces (newest first), optionally of one kind."""
+    with _lock:
+        traces = list(_traces)
+    traces = [t for t in reversed(traces) if kind is None or t.kind == kind]
+    return traces[:n]
+
+
+def export_json(n=20, kind=None):
+    with _lock:
+        stages = {f"{k}.{s}": {"count": c, "seconds": round(sec, 6)} for (k, s), (c, sec) in _stage_totals.items()}
+        counters = {f"{k}.{name}": v for (name, k), v in _counters.items()}
+    return {
+        "traces": [t.to_dict() for t in recent_traces(n, kind)],
+        "stages": stages,
+        "counters": counters,
+    }
+
+
+def export_prometheus():
+    """All aggregates in the Prometheus text exposition format."""
+    with _lock:
+        stages = sorted(_stage_totals.items())
+        traces = sorted(_trace_totals.items())
+        counters = sorted(_counters.items())
+
+    lines = [
+        f"# HELP {METRIC_PREFIX}_request_seconds Wall time of finished traces.",
+        f"# TYPE {METRIC_PREFIX}_request_seconds summary",
+    ]
+    for (kind, status), (c, seconds) in traces:
+        labels = f'kind="{kind}",status="{status}"'
+        lines.append(f"{METRIC_PREFIX}_request_seconds_count{{{labels}}} {c}")
+        lines.append(f"{METRIC_PREFIX}_request_seconds_sum{{{labels}}} {seconds:.6f}")
+
+    lines += [
+        f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per pipeline stage.",
+        f"# TYPE {METRIC_PREFIX}_stage_seconds summary",
+    ]
+    for (kind, stage), (c, seconds) in stages:
+        labels = f'kind="{kind}",stage="{stage}"'
+        lines.append(f"{METRIC_PREFIX}_stage_seconds_count{{{labels}}} {c}")
+        lines.append(f"{METRIC_PREFIX}_stage_seconds_sum{{{labels}}} {seconds:.6f}")
+
+    for name in sorted({name for (name, _), _ in counters}):
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+        for (n, kind), value in counters:
+            if n == name:
+                lines.append(f'{METRIC_PREFIX}_{name}_total{{kind="{kind}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Drop all traces and aggregates."""
+    with _lock:
+        _traces.clear()
+        _stage_totals.clear()
+        _counters.clear()
+        _trace_totals.clear()
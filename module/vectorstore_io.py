@@ -0,0 +1,223 @@
+import os
+import json
+import glob
+import bisect
+import sqlite3
+import logging
+import threading
+from collections.abc import Mapping
+import faiss
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+# On-disk vectorstore format (manifest "format": 3):
+#   index-v<N>.faiss     FAISS index, memory-mapped read-only by query processes
+#   ids-v<N>.npy         docstore id of every FAISS position (fixed-width bytes, mmapped)
+#   ids-v<N>.order.npy   argsort of the ids, for id → position lookups
+#   chunks.sqlite        chunk text and metadata, fetched lazily by id, and the
+#                        BM25 postings (module/lexical_index.py)
+# Index and id files are versioned and never rewritten in place, so replicas that
+# still map the previous version keep working while a new one is published.
+FORMAT_VERSION = 3
+CHUNKS_DB = "chunks.sqlite"
+KEEP_VERSIONS = 2  # current + previous, for readers that haven't switched yet
+
+# How read-only indexes are memory-mapped, tried in order: flat-code and HNSW
+# indexes map their codes (MMAP_IFC); IVF indexes map their inverted lists, which
+# FAISS only does when reading from a plain file (MMAP without MMAP_IFC)
+MMAP_FLAGS = (
+    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY,
+    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    LangChain docstore backed by SQLite. Nothing is loaded up front; chunks are
+    read by id on demand. Deletes are deferred until `commit()` so processes
+    still serving the previous index version can resolve its ids until the new
+    version is published.
+    """
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self.pending_deletes = set()
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+    def search(self, search):
+        with self._lock:
+            row = self._conn.execute("SELECT content, metadata FROM chunks WHERE id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts):
+        rows = [(doc_id, doc.page_content, json.dumps(doc.metadata)) for doc_id, doc in texts.items()]
+        with self._lock:
+            self.pending_deletes.difference_update(texts)
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (id, content, metadata) VALUES (?, ?, ?)", rows)
+
+    def delete(self, ids):
+        with self._lock:
+            self.pending_deletes.update(ids)
+
+    def execute(self, sql, params=()):
+        """Run a statement on the store's connection (and transaction); returns all rows."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def executemany(self, sql, rows):
+        with self._lock:
+            self._conn.executemany(sql, rows)
+
+    def clear(self):
+        with self._lock:
+            self.pending_deletes.clear()
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def commit(self):
+        """Persist added chunks; deferred deletes stay pending."""
+        with self._lock:
+            self._conn.commit()
+
+    def apply_deletes(self):
+        """Drop deleted chunks, once no published index version refers to them."""
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in self.pending_deletes])
+            self.pending_deletes.clear()
+            self._conn.commit()
+
+
+class PositionIds(Mapping):
+    """Read-only FAISS position → docstore id mapping over memory-mapped id arrays."""
+    def __init__(self, ids, order):
+        self._ids = ids
+        self._order = order
+
+    def __getitem__(self, position):
+        if not 0 <= position < len(self._ids):
+            raise KeyError(position)
+        return self._ids[position].decode()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(range(len(self._ids)))
+
+    def position_of(self, doc_id):
+        """FAISS position of `doc_id`, or None."""
+        key = doc_id.encode()
+        # Binary search through the argsort: touches log2(n) ids instead of gathering all of them
+        i = bisect.bisect_left(self._order, key, key=lambda position: self._ids[position])
+        if i < len(self._order) and self._ids[self._order[i]] == key:
+            return int(self._order[i])
+        return None
+
+
+def new_docstore(folder):
+    """Writable, empty chunk store for a fresh index."""
+    docstore = SQLiteDocstore(os.path.join(folder, CHUNKS_DB))
+    docstore.clear()
+    return docstore
+
+
+def _atomic_save(path, array):
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def write_index_files(vectorstore, folder, version):
+    """Write the index and id arrays for `version`; returns the manifest entries naming them."""
+    index_file = f"index-v{version}.faiss"
+    ids_file = f"ids-v{version}.npy"
+
+    tmp_path = os.path.join(folder, index_file + ".tmp")
+    faiss.write_index(vectorstore.index, tmp_path)
+    os.replace(tmp_path, os.path.join(folder, index_file))
+
+    ids = np.array(
+        [vectorstore.index_to_docstore_id[i].encode() for i in range(vectorstore.index.ntotal)],
+        dtype=bytes,
+    )
+    _atomic_save(os.path.join(folder, ids_file), ids)
+    _atomic_save(os.path.join(folder, ids_file.replace(".npy", ".order.npy")), np.argsort(ids, kind="stable"))
+
+    vectorstore.docstore.commit()
+    return {"format": FORMAT_VERSION, "index_file": index_file, "ids_file": ids_file, "dim": vectorstore.index.d}
+
+
+def remove_stale_files(folder, manifest):
+    """Delete index/id files older than the last KEEP_VERSIONS versions."""
+    oldest_kept = manifest["version"] - KEEP_VERSIONS + 1
+    for path in glob.glob(os.path.join(folder, "index-v*.faiss")) + glob.glob(os.path.join(folder, "ids-v*.npy")):
+        name = os.path.basename(path)
+        version = name.split("-v", 1)[1].split(".", 1)[0]
+        if version.isdigit() and int(version) < oldest_kept:
+            os.remove(path)
+
+
+def load_index_files(folder, manifest, embeddings, read_only=True):
+    """
+    Open the vectorstore described by `manifest`.
+
+    Read-only (query) mode memory-maps the FAISS index and the id arrays and
+    reads chunks lazily from SQLite, so start-up cost doesn't grow with the
+    corpus and replicas share the OS page cache. Writable mode (ingestion)
+    loads the index into memory and builds a mutable id mapping.
+    """
+    index_path = os.path.join(folder, manifest["index_file"])
+    ids_path = os.path.join(folder, manifest["ids_file"])
+    docstore = SQLiteDocstore(os.path.join(folder, CHUNKS_DB), read_only=read_only)
+
+    if read_only:
+        index = _read_mapped(index_path)
+        ids = np.load(ids_path, mmap_mode="r")
+        order = np.load(ids_path.replace(".npy", ".order.npy"), mmap_mode="r")
+        index_to_docstore_id = PositionIds(ids, order)
+    else:
+        index = faiss.read_index(index_path)
+        ids = np.load(ids_path)
+        index_to_docstore_id = {i: doc_id.decode() for i, doc_id in enumerate(ids)}
+
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def _read_mapped(index_path):
+    for flags in MMAP_FLAGS:
+        try:
+            return faiss.read_index(index_path, flags)
+        except RuntimeError:
+            continue
+    logger.warning("%s cannot be memory-mapped, loading it into memory", index_path)
+    return faiss.read_index(index_path, faiss.IO_FLAG_READ_ONLY)
+
+
+def migrate_pickle_store(folder, embeddings):
+    """
+    Load a vectorstore saved by FAISS.save_local (index.faiss + pickled index.pkl)
+    and move its docstore into SQLite. The pickle is our own earlier output, so
+    it is deserialized once here and then removed.
+    """
+    legacy = FAISS.load_local(folder, embeddings, allow_dangerous_deserialization=True)
+    docstore = new_docstore(folder)
+    ids = list(legacy.index_to_docstore_id.values())
+    docstore.add({doc_id: legacy.docstore.search(doc_id) for doc_id in ids})
+    docstore.commit()
+    legacy.docstore = docstore
+    return legacy